@@ -7,6 +7,7 @@ Photo Watermark Tool - 主入口文件
 
 import sys
 import argparse
+import multiprocessing
 
 def main():
     """主函数"""
@@ -71,4 +72,6 @@ def main():
     return 0
 
 if __name__ == '__main__':
+    # 打包后GUI批量处理使用的进程池子进程会重新运行入口程序，需由freeze_support接管
+    multiprocessing.freeze_support()
     sys.exit(main())
\ No newline at end of file
@@ -7,6 +7,7 @@ Photo Watermark Tool
 
 import os
 import sys
+import functools
 import argparse
 from datetime import datetime
 from pathlib import Path
@@ -27,6 +28,95 @@ except ImportError:
     logger.warning("模板管理功能不可用")
 
 
+# 在macOS上尝试使用的系统字体
+_FONT_PATHS = (
+    '/System/Library/Fonts/Arial.ttf',
+    '/System/Library/Fonts/Helvetica.ttc',
+    '/Library/Fonts/Arial.ttf'
+)
+
+
+# 水印与图片边缘的距离
+_POSITION_MARGIN = 20
+
+# 各位置的坐标计算函数，参数为 (图片宽, 图片高, 水印宽, 水印高, 边距)
+_POSITION_FUNCS = {
+    'top_left': lambda W, H, w, h, m: (m, m),
+    'top_center': lambda W, H, w, h, m: ((W - w) // 2, m),
+    'top_right': lambda W, H, w, h, m: (W - w - m, m),
+    'center_left': lambda W, H, w, h, m: (m, (H - h) // 2),
+    'center': lambda W, H, w, h, m: ((W - w) // 2, (H - h) // 2),
+    'center_right': lambda W, H, w, h, m: (W - w - m, (H - h) // 2),
+    'bottom_left': lambda W, H, w, h, m: (m, H - h - m),
+    'bottom_center': lambda W, H, w, h, m: ((W - w) // 2, H - h - m),
+    'bottom_right': lambda W, H, w, h, m: (W - w - m, H - h - m)
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _find_font_path():
+    """查找可用的系统字体文件（只查找一次），找不到时返回None"""
+    for font_path in _FONT_PATHS:
+        if os.path.exists(font_path):
+            return font_path
+    
+    logger.warning("未找到系统字体，使用默认字体")
+    return None
+
+
+@functools.lru_cache(maxsize=32)
+def _load_font(font_size):
+    """
+    加载水印字体（带缓存），找不到系统字体时使用默认字体
+    
+    Args:
+        font_size (int): 字体大小
+        
+    Returns:
+        ImageFont: 字体对象
+    """
+    font_path = _find_font_path()
+    if font_path:
+        try:
+            return ImageFont.truetype(font_path, font_size)
+        except Exception as e:
+            logger.warning(f"加载字体失败，使用默认字体: {e}")
+    
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=8)
+def _load_watermark_layer(path, mtime, scale, opacity):
+    """
+    加载水印图片并缩放、应用透明度（带缓存）
+    
+    mtime参与缓存键，文件被修改后会重新加载。返回的图片为共享对象，调用方不应原地修改。
+    
+    Args:
+        path (str): 水印图片路径
+        mtime (float): 水印图片修改时间
+        scale (float): 水印缩放比例
+        opacity (int): 透明度 (0-100)
+        
+    Returns:
+        PIL.Image: RGBA水印图层
+    """
+    with Image.open(path) as watermark_img:
+        watermark_img = watermark_img.convert('RGBA')
+    
+    # 缩放水印图片
+    wm_width = int(watermark_img.width * scale)
+    wm_height = int(watermark_img.height * scale)
+    watermark_img = watermark_img.resize((wm_width, wm_height), Image.Resampling.LANCZOS)
+    
+    # 设置透明度：按比例缩放原有alpha通道，保留水印图片自身的透明区域
+    alpha = int(255 * opacity / 100)
+    alpha_table = [p * alpha // 255 for p in range(256)]
+    watermark_img.putalpha(watermark_img.getchannel('A').point(alpha_table))
+    
+    return watermark_img
+
+
 class PhotoWatermark:
     """图片水印处理类"""
     
@@ -82,7 +172,7 @@ class PhotoWatermark:
             return None
         
         manager = TemplateManager()
-        config = manager.load_template(template_name)
+        config = manager.load_template(template_name, copy=False)
         
         if config is None:
             return None
@@ -143,68 +233,31 @@ class PhotoWatermark:
         Returns:
             tuple: 文本位置坐标 (x, y)
         """
-        img_width, img_height = image_size
-        text_width, text_height = text_size
-        
-        # 边距
-        margin = 20
-        
-        position_coords = {
-            'top_left': (margin, margin),
-            'top_center': ((img_width - text_width) // 2, margin),
-            'top_right': (img_width - text_width - margin, margin),
-            'center_left': (margin, (img_height - text_height) // 2),
-            'center': ((img_width - text_width) // 2, (img_height - text_height) // 2),
-            'center_right': (img_width - text_width - margin, (img_height - text_height) // 2),
-            'bottom_left': (margin, img_height - text_height - margin),
-            'bottom_center': ((img_width - text_width) // 2, img_height - text_height - margin),
-            'bottom_right': (img_width - text_width - margin, img_height - text_height - margin)
-        }
-        
-        return position_coords.get(self.POSITION_MAP.get(position, 'bottom_right'), 
-                                 position_coords['bottom_right'])
+        position_func = _POSITION_FUNCS[self.POSITION_MAP.get(position, 'bottom_right')]
+        return position_func(*image_size, *text_size, _POSITION_MARGIN)
     
-    def add_text_watermark(self, image, watermark_text):
+    def add_text_watermark(self, image, watermark_text, copy=True):
         """
         为图片添加文本水印
         
         Args:
             image (PIL.Image): 图片对象
             watermark_text (str): 水印文本
+            copy (bool): 是否在副本上绘制；为False时RGB/RGBA图片会被直接修改
             
         Returns:
             PIL.Image: 添加水印后的图片
         """
-        # 转换为RGBA模式以支持透明度
-        if image.mode != 'RGBA':
+        # RGB/RGBA图片保持原模式，只在水印区域内合成；其他模式转换为RGBA
+        # （默认复制或转换后再修改，避免改动传入的图片）
+        if image.mode not in ('RGB', 'RGBA'):
             image = image.convert('RGBA')
+        elif copy:
+            image = image.copy()
+        draw = ImageDraw.Draw(image)
         
-        # 创建透明图层用于绘制水印
-        watermark_layer = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(watermark_layer)
-        
-        # 尝试加载字体
-        try:
-            # 在macOS上尝试使用系统字体
-            font_paths = [
-                '/System/Library/Fonts/Arial.ttf',
-                '/System/Library/Fonts/Helvetica.ttc',
-                '/Library/Fonts/Arial.ttf'
-            ]
-            
-            font = None
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    font = ImageFont.truetype(font_path, self.font_size)
-                    break
-            
-            if font is None:
-                font = ImageFont.load_default()
-                logger.warning("使用默认字体")
-                
-        except Exception as e:
-            font = ImageFont.load_default()
-            logger.warning(f"加载字体失败，使用默认字体: {e}")
+        # 加载字体（按字号缓存，批量处理时只查找和解析一次字体文件）
+        font = _load_font(self.font_size)
         
         # 获取文本尺寸
         bbox = draw.textbbox((0, 0), watermark_text, font=font)
@@ -221,22 +274,40 @@ class PhotoWatermark:
         # 计算透明度
         alpha = int(255 * self.opacity / 100)
         
+        # 水印区域：半透明背景和文本实际绘制范围的并集
+        padding = 10
+        rect = (x - padding, y - padding, x + text_width + padding, y + text_height + padding)
+        left = max(min(rect[0], x + bbox[0]), 0)
+        top = max(min(rect[1], y + bbox[1]), 0)
+        right = min(max(rect[2], x + bbox[2]) + 1, image.width)
+        bottom = min(max(rect[3], y + bbox[3]) + 1, image.height)
+        
+        if left >= right or top >= bottom:
+            return image
+        
+        # 只在水印区域大小的图层上绘制，避免分配和合成整图大小的图层
+        watermark_layer = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(watermark_layer)
+        
         # 添加半透明背景
         background_color = (0, 0, 0, alpha // 2)  # 半透明黑色背景
-        padding = 10
         draw.rectangle([
-            x - padding, y - padding,
-            x + text_width + padding, y + text_height + padding
+            rect[0] - left, rect[1] - top,
+            rect[2] - left, rect[3] - top
         ], fill=background_color)
         
         # 绘制文本
-        draw.text((x, y), watermark_text, font=font, fill=(*self.font_color, alpha))
-        
-        # 合并图层
-        watermarked = Image.alpha_composite(image, watermark_layer)
-        return watermarked
+        draw.text((x - left, y - top), watermark_text, font=font, fill=(*self.font_color, alpha))
+        
+        # 合并图层：只把水印区域转换为RGBA进行合成
+        region = image.crop((left, top, right, bottom))
+        if region.mode != 'RGBA':
+            region = region.convert('RGBA')
+        region.alpha_composite(watermark_layer)
+        image.paste(region if image.mode == 'RGBA' else region.convert(image.mode), (left, top))
+        return image
     
-    def add_image_watermark(self, image, watermark_image_path, scale=0.2):
+    def add_image_watermark(self, image, watermark_image_path, scale=0.2, copy=True):
         """
         为图片添加图片水印
         
@@ -244,33 +315,27 @@ class PhotoWatermark:
             image (PIL.Image): 原图片对象
             watermark_image_path (str): 水印图片路径
             scale (float): 水印缩放比例
+            copy (bool): 是否在副本上粘贴；为False时RGB/RGBA图片会被直接修改
             
         Returns:
             PIL.Image: 添加水印后的图片
         """
         try:
-            with Image.open(watermark_image_path) as watermark_img:
-                # 转换为RGBA模式以支持透明度
-                if image.mode != 'RGBA':
-                    image = image.convert('RGBA')
-                
-                if watermark_img.mode != 'RGBA':
-                    watermark_img = watermark_img.convert('RGBA')
-                
-                # 缩放水印图片
-                wm_width = int(watermark_img.width * scale)
-                wm_height = int(watermark_img.height * scale)
-                watermark_img = watermark_img.resize((wm_width, wm_height), Image.Resampling.LANCZOS)
-                
-                # 设置透明度
-                alpha = int(255 * self.opacity / 100)
-                watermark_img.putalpha(alpha)
-                
-                # 计算位置
-                x, y = self.calculate_text_position(image.size, (wm_width, wm_height), self.position)
-                
-                # 粘贴水印
-                image.paste(watermark_img, (x, y), watermark_img)
+            # 批量处理时同一水印图片只加载、缩放一次
+            watermark_img = _load_watermark_layer(
+                watermark_image_path, os.path.getmtime(watermark_image_path), scale, self.opacity)
+            
+            # RGB/RGBA底图可直接按蒙版粘贴，只修改水印覆盖区域，无需整图转换
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            elif copy:
+                image = image.copy()
+            
+            # 计算位置
+            x, y = self.calculate_text_position(image.size, watermark_img.size, self.position)
+            
+            # 粘贴水印
+            image.paste(watermark_img, (x, y), watermark_img)
                 
         except Exception as e:
             logger.error(f"添加图片水印失败: {e}")
@@ -292,15 +357,16 @@ class PhotoWatermark:
         """
         try:
             with Image.open(image_path) as image:
-                watermarked = image.copy()
+                # 打开的图片只在此处使用，各水印步骤可直接在其上绘制，无需复制整张图片
+                watermarked = image
                 
                 # 添加文本水印
                 if watermark_text:
-                    watermarked = self.add_text_watermark(watermarked, watermark_text)
+                    watermarked = self.add_text_watermark(watermarked, watermark_text, copy=False)
                 
                 # 添加图片水印
                 if watermark_image_path and os.path.exists(watermark_image_path):
-                    watermarked = self.add_image_watermark(watermarked, watermark_image_path)
+                    watermarked = self.add_image_watermark(watermarked, watermark_image_path, copy=False)
                 
                 # 保存图片
                 self.save_image(watermarked, output_path)
@@ -398,11 +464,13 @@ class PhotoWatermark:
         output_path.mkdir(exist_ok=True)
         logger.info(f"输出目录: {output_path}")
         
-        # 查找所有支持的图片文件
-        image_files = []
-        for ext in self.SUPPORTED_FORMATS:
-            image_files.extend(input_path.glob(f"*{ext}"))
-            image_files.extend(input_path.glob(f"*{ext.upper()}"))
+        # 查找所有支持的图片文件：一次scandir遍历目录，扩展名不区分大小写
+        # （逐个扩展名glob需要多次遍历目录，在不区分大小写的文件系统上还会重复匹配）
+        with os.scandir(input_path) as entries:
+            image_files = sorted(
+                Path(entry.path) for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in self.SUPPORTED_FORMATS and entry.is_file()
+            )
         
         if not image_files:
             logger.warning(f"在目录 {input_dir} 中未找到支持的图片文件")
@@ -7,16 +7,96 @@
 
 import json
 import os
+import tempfile
+import threading
 from pathlib import Path
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+# orjson为可选依赖，可用时用于加速模板导入导出
+try:
+    import orjson
+    ORJSON_SUPPORT = True
+except ImportError:
+    ORJSON_SUPPORT = False
+
+# 导入导出文件的缓冲区大小，单个模板可一次读写完成
+_FILE_BUFFER_SIZE = 1 << 18
+
+# 模板配置必需字段
+_REQUIRED_FIELDS = ('font_size', 'font_color', 'position', 'opacity')
+
+
+def _dumps_json(data):
+    """序列化为带缩进的UTF-8 JSON字节串"""
+    if ORJSON_SUPPORT:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _loads_json(raw):
+    """从UTF-8 JSON字节串反序列化"""
+    if ORJSON_SUPPORT:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def write_atomic(path, data):
+    """
+    原子地写入文件：先写入同目录下的唯一临时文件再替换目标文件
+    
+    写入中断时不会损坏原文件；多个进程同时写入同一文件时各自使用不同的临时文件。
+    
+    Args:
+        path (Path): 目标文件路径
+        data (bytes): 文件内容
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_template_file(path):
+    """
+    读取并验证单个模板文件（供进程池调用）
+    
+    Args:
+        path (str): 模板文件路径
+        
+    Returns:
+        tuple: (模板数据, 错误信息)，成功时错误信息为None
+    """
+    try:
+        with open(path, 'rb', buffering=_FILE_BUFFER_SIZE) as f:
+            template_data = _loads_json(f.read())
+        
+        if not isinstance(template_data.get('name'), str) or not template_data['name']:
+            return None, "模板缺少名称"
+        
+        if not TemplateManager._validate_config(template_data['config']):
+            return None, "模板配置无效"
+        
+        return template_data, None
+    except Exception as e:
+        return None, str(e)
+
 
 class WatermarkTemplate:
     """水印模板类"""
     
+    __slots__ = ('name', 'config', 'description', 'created_at')
+    
     def __init__(self, name, config, description="", created_at=None):
         """
         初始化水印模板
@@ -44,23 +124,21 @@ class WatermarkTemplate:
     @classmethod
     def from_dict(cls, data):
         """从字典创建模板"""
-        return cls(
-            name=data['name'],
-            config=data['config'],
-            description=data.get('description', ''),
-            created_at=data.get('created_at')
-        )
+        # 按位置传参，避免关键字参数调用的额外开销
+        return cls(data['name'], data['config'],
+                   data.get('description', ''), data.get('created_at'))
 
 
 class TemplateManager:
     """模板管理器"""
     
-    def __init__(self, templates_dir=None):
+    def __init__(self, templates_dir=None, autosave=True):
         """
         初始化模板管理器
         
         Args:
             templates_dir (str): 模板存储目录
+            autosave (bool): 修改后是否立即写入文件；为False时只标记为未保存，由调用方调用flush()写入
         """
         if templates_dir:
             self.templates_dir = Path(templates_dir)
@@ -72,6 +150,14 @@ class TemplateManager:
         self.templates_dir.mkdir(exist_ok=True)
         self.templates_file = self.templates_dir / 'templates.json'
         
+        self.autosave = autosave
+        self.dirty = False  # 是否有尚未写入文件的修改
+        self._write_lock = threading.Lock()  # 串行化文件写入，后台写入与同步写入共用临时文件
+        self._snapshot_lock = threading.Lock()
+        self._generation = 0  # 最近一次快照的编号
+        self._written_generation = 0  # 已写入文件的最新快照编号
+        self._flush_threads = []  # 尚未结束的后台写入线程
+        
         # 加载现有模板
         self.templates = self._load_templates()
     
@@ -81,28 +167,97 @@ class TemplateManager:
             return {}
         
         try:
-            with open(self.templates_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return {name: WatermarkTemplate.from_dict(template_data) 
-                       for name, template_data in data.items()}
+            with open(self.templates_file, 'rb') as f:
+                data = _loads_json(f.read())
+            return {name: WatermarkTemplate.from_dict(template_data) 
+                   for name, template_data in data.items()}
         except Exception as e:
             logger.error(f"加载模板文件失败: {e}")
             return {}
     
     def _save_templates(self):
         """保存模板到文件"""
-        try:
+        return self._write_templates(*self._snapshot())
+    
+    def _snapshot(self):
+        """
+        生成可序列化的模板数据
+        
+        Returns:
+            tuple: (快照编号, 模板数据)，编号按生成顺序递增
+        """
+        with self._snapshot_lock:
+            self._generation += 1
             data = {name: template.to_dict() 
                    for name, template in self.templates.items()}
+            return self._generation, data
+    
+    def _write_templates(self, generation, data):
+        """将模板数据写入JSON文件，已写入更新的快照时跳过"""
+        with self._write_lock:
+            # 后台写入线程获取锁的顺序不确定，避免旧快照覆盖新数据
+            if generation <= self._written_generation:
+                return True
             
-            with open(self.templates_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            try:
+                write_atomic(self.templates_file, _dumps_json(data))
+                self._written_generation = generation
+                
+                logger.info(f"模板已保存到: {self.templates_file}")
+                return True
+            except Exception as e:
+                logger.error(f"保存模板文件失败: {e}")
+                return False
+    
+    def _commit(self):
+        """提交修改：自动保存时立即写入，否则标记为未保存"""
+        if self.autosave:
+            return self._save_templates()
+        
+        self.dirty = True
+        return True
+    
+    def flush(self, background=False):
+        """
+        写入尚未保存的修改
+        
+        Args:
+            background (bool): 是否在后台线程中写入文件
             
-            logger.info(f"模板已保存到: {self.templates_file}")
+        Returns:
+            bool: 是否保存成功；后台写入时总是返回True，失败会记录日志
+        """
+        if not background:
+            # 等待已启动的后台写入完成，写入失败时会重新标记为未保存，下面同步重试
+            for thread in self._flush_threads:
+                thread.join()
+            self._flush_threads.clear()
+        
+        if not self.dirty:
             return True
-        except Exception as e:
-            logger.error(f"保存模板文件失败: {e}")
+        
+        # 在调用线程中生成快照，后台线程不会访问self.templates
+        generation, data = self._snapshot()
+        self.dirty = False
+        
+        if background:
+            thread = threading.Thread(target=self._background_write, args=(generation, data), daemon=True)
+            self._flush_threads = [t for t in self._flush_threads if t.is_alive()]
+            self._flush_threads.append(thread)
+            thread.start()
+            return True
+        
+        if not self._write_templates(generation, data):
+            self.dirty = True
             return False
+        return True
+    
+    def _background_write(self, generation, data):
+        """后台写入快照，失败且之后没有新快照时重新标记为未保存"""
+        if not self._write_templates(generation, data):
+            with self._snapshot_lock:
+                if generation == self._generation:
+                    self.dirty = True
     
     def save_template(self, name, config, description="", overwrite=False):
         """
@@ -131,14 +286,15 @@ class TemplateManager:
         self.templates[name] = template
         
         # 保存到文件
-        return self._save_templates()
+        return self._commit()
     
-    def load_template(self, name):
+    def load_template(self, name, copy=True):
         """
         加载水印模板
         
         Args:
             name (str): 模板名称
+            copy (bool): 是否返回配置副本，只读调用方可传False避免复制
             
         Returns:
             dict: 水印配置，如果模板不存在返回None
@@ -147,7 +303,8 @@ class TemplateManager:
             logger.warning(f"模板 '{name}' 不存在")
             return None
         
-        return self.templates[name].config.copy()
+        config = self.templates[name].config
+        return config.copy() if copy else config
     
     def delete_template(self, name):
         """
@@ -164,7 +321,7 @@ class TemplateManager:
             return False
         
         del self.templates[name]
-        return self._save_templates()
+        return self._commit()
     
     def list_templates(self):
         """
@@ -183,7 +340,17 @@ class TemplateManager:
             for template in self.templates.values()
         ]
     
-    def _validate_config(self, config):
+    def list_template_names(self):
+        """
+        列出所有模板名称，不生成配置摘要
+        
+        Returns:
+            list: 模板名称列表
+        """
+        return list(self.templates)
+    
+    @staticmethod
+    def _validate_config(config):
         """
         验证水印配置
         
@@ -193,9 +360,7 @@ class TemplateManager:
         Returns:
             bool: 配置是否有效
         """
-        required_fields = ['font_size', 'font_color', 'position', 'opacity']
-        
-        for field in required_fields:
+        for field in _REQUIRED_FIELDS:
             if field not in config:
                 logger.error(f"缺少必需的配置字段: {field}")
                 return False
@@ -266,8 +431,8 @@ class TemplateManager:
         
         try:
             template_data = self.templates[name].to_dict()
-            with open(export_path, 'w', encoding='utf-8') as f:
-                json.dump(template_data, f, ensure_ascii=False, indent=2)
+            with open(export_path, 'wb', buffering=_FILE_BUFFER_SIZE) as f:
+                f.write(_dumps_json(template_data))
             
             logger.info(f"模板 '{name}' 已导出到: {export_path}")
             return True
@@ -287,8 +452,8 @@ class TemplateManager:
             bool: 是否导入成功
         """
         try:
-            with open(import_path, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
+            with open(import_path, 'rb', buffering=_FILE_BUFFER_SIZE) as f:
+                template_data = _loads_json(f.read())
             
             template = WatermarkTemplate.from_dict(template_data)
             
@@ -302,11 +467,58 @@ class TemplateManager:
                 return False
             
             self.templates[template.name] = template
-            return self._save_templates()
+            return self._commit()
             
         except Exception as e:
             logger.error(f"导入模板失败: {e}")
             return False
+    
+    def import_templates_dir(self, import_dir, overwrite=False):
+        """
+        从目录批量导入模板，文件解析和验证在多进程中并行执行
+        
+        Args:
+            import_dir (str): 包含模板JSON文件的目录
+            overwrite (bool): 是否覆盖已存在的模板
+            
+        Returns:
+            tuple: (成功数量, 总数量)
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        
+        files = sorted(str(p) for p in Path(import_dir).glob('*.json'))
+        if not files:
+            logger.warning(f"在目录 {import_dir} 中未找到模板文件")
+            return 0, 0
+        
+        workers = min(os.cpu_count() or 1, len(files))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_read_template_file, files))
+        
+        imported = 0
+        for path, (template_data, error) in zip(files, results):
+            if error:
+                logger.error(f"导入模板失败 {path}: {error}")
+                continue
+            
+            try:
+                template = WatermarkTemplate.from_dict(template_data)
+            except Exception as e:
+                logger.error(f"导入模板失败 {path}: {e}")
+                continue
+            
+            if template.name in self.templates and not overwrite:
+                logger.warning(f"模板 '{template.name}' 已存在，使用 overwrite=True 来覆盖")
+                continue
+            
+            self.templates[template.name] = template
+            imported += 1
+        
+        # 所有模板合并后只写一次文件
+        if imported and not self._commit():
+            return 0, len(files)
+        
+        return imported, len(files)
 
 
 def main():
@@ -342,7 +554,7 @@ def main():
     
     # 导入模板
     import_parser = subparsers.add_parser('import', help='导入模板')
-    import_parser.add_argument('input', help='输入文件路径')
+    import_parser.add_argument('input', help='输入文件路径或模板目录')
     import_parser.add_argument('--overwrite', action='store_true', help='覆盖已存在的模板')
     
     args = parser.parse_args()
@@ -400,7 +612,10 @@ def main():
             print(f"❌ 模板 '{args.name}' 导出失败")
     
     elif args.command == 'import':
-        if manager.import_template(args.input, args.overwrite):
+        if os.path.isdir(args.input):
+            success_count, total_count = manager.import_templates_dir(args.input, args.overwrite)
+            print(f"✅ 批量导入完成: {success_count}/{total_count} 个模板成功")
+        elif manager.import_template(args.input, args.overwrite):
             print("✅ 模板导入成功")
         else:
             print("❌ 模板导入失败")
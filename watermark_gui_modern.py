@@ -14,13 +14,20 @@ __license__ = "MIT"
 
 import os
 import sys
+import io
 import json
+import functools
+import hashlib
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, colorchooser
 import tkinter.simpledialog
 from pathlib import Path
 import threading
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import PIL
+from PIL import Image, ImageTk, ImageDraw, ImageFont, features
 from typing import List, Dict, Optional, Tuple
 import logging
 from tkinterdnd2 import DND_FILES, TkinterDnD
@@ -31,17 +38,700 @@ logger = logging.getLogger(__name__)
 
 # 导入现有模块
 try:
-    from photo_watermark import PhotoWatermark
-    from template_manager import TemplateManager
+    from template_manager import TemplateManager, write_atomic
 except ImportError as e:
     logger.error(f"Failed to import required modules: {e}")
     sys.exit(1)
 
+# imagesize为可选依赖，可用时只读取文件头的几个字节获取图片尺寸
+try:
+    import imagesize
+    IMAGESIZE_SUPPORT = True
+except ImportError:
+    IMAGESIZE_SUPPORT = False
+
+# 列表缩略图的磁盘缓存目录，再次导入同一批图片时无需重新解码
+THUMBNAIL_CACHE_DIR = Path.home() / '.watermark_thumbnails'
+
+# 缩略图磁盘缓存最多保留的文件数，超出时删除最久未使用的文件
+THUMBNAIL_CACHE_MAX_FILES = 2000
+
+# 上次关闭时的水印配置和输出目录，下次启动时恢复
+LAST_SETTINGS_FILE = Path.home() / '.watermark_settings.json'
+
+# 预览使用较快的重采样算法，导出时保持LANCZOS质量
+PREVIEW_RESAMPLE = Image.Resampling.BILINEAR
+
+# 支持导入的图片扩展名
+SUPPORTED_EXTS = frozenset({'.jpg', '.jpeg', '.png', '.bmp', '.tiff'})
+
+
+@functools.lru_cache(maxsize=64)
+def load_font(font_family, font_size):
+    """加载字体（带缓存），失败时返回默认字体"""
+    try:
+        return ImageFont.truetype(font_family, font_size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=64)
+def measure_text(text, font_family, font_size):
+    """
+    计算文本边界框（带缓存）
+    
+    拖拽时每次移动都要计算指示器大小，文本和字体不变时直接返回缓存结果。
+    
+    Returns:
+        tuple: (left, top, right, bottom)
+    """
+    return load_font(font_family, font_size).getbbox(text)
+
+
+@functools.lru_cache(maxsize=128)
+def parse_hex_color(color_hex):
+    """
+    将十六进制颜色转换为RGB元组（带缓存）
+    
+    Args:
+        color_hex (str): 颜色值，如 "#FFFFFF"，可省略开头的#
+        
+    Returns:
+        tuple: (r, g, b)
+    """
+    color_hex = color_hex.lstrip('#')
+    return tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
+
+
+@functools.lru_cache(maxsize=8)
+def load_watermark_image(path, mtime):
+    """
+    加载水印图片并转换为RGBA（带缓存）
+    
+    mtime参与缓存键，文件被修改后会重新加载。返回的图片为共享对象，调用方不应原地修改。
+    """
+    with Image.open(path) as watermark:
+        return watermark.convert('RGBA')
+
+
+@functools.lru_cache(maxsize=8)
+def build_watermark_layer(path, mtime, size, opacity, resample):
+    """
+    生成缩放并应用透明度后的水印图层（带缓存）
+    
+    批量导出时同一进程内的所有图片共用同一图层，只在首次使用时缩放一次。
+    返回的图片为共享对象，调用方不应原地修改。
+    
+    Args:
+        path (str): 水印图片路径
+        mtime (float): 水印图片修改时间
+        size (tuple): 目标尺寸 (width, height)
+        opacity (int): 透明度 (0-100)
+        resample (int): 重采样算法
+        
+    Returns:
+        PIL.Image: RGBA水印图层
+    """
+    watermark = load_watermark_image(path, mtime).resize(size, resample)
+    
+    # 应用透明度：查找表在C层面逐像素映射，无需为每个像素调用Python函数
+    alpha_table = [int(p * opacity / 100) for p in range(256)]
+    watermark.putalpha(watermark.getchannel('A').point(alpha_table))
+    
+    return watermark
+
+
+@functools.lru_cache(maxsize=16)
+def build_text_sprite(text, font_family, font_size, color, alpha, rotation):
+    """
+    渲染文本水印图块（带缓存）
+    
+    仅调整位置或偏移时可直接复用已渲染、已旋转的图块。返回的图片为共享对象，调用方不应原地修改。
+    
+    Args:
+        text (str): 水印文本
+        font_family (str): 字体名称
+        font_size (int): 字体大小
+        color (tuple): RGB颜色
+        alpha (int): 文本透明度 (0-255)
+        rotation (int): 旋转角度
+        
+    Returns:
+        PIL.Image: RGBA图块，尺寸为文本边界框（旋转后扩展）
+    """
+    tile = build_text_tile(text, font_family, font_size, color, alpha)
+    
+    if rotation != 0:
+        tile = tile.rotate(rotation, resample=Image.Resampling.BICUBIC, expand=True)
+        
+    return tile
+
+
+@functools.lru_cache(maxsize=8)
+def build_text_tile(text, font_family, font_size, color, alpha):
+    """
+    栅格化未旋转的文本图块（带缓存）
+    
+    只调整旋转角度时复用已栅格化的文字，只需重新旋转。返回的图片为共享对象，调用方不应原地修改。
+    
+    Returns:
+        PIL.Image: RGBA图块，尺寸为文本边界框
+    """
+    font = load_font(font_family, font_size)
+    bbox = measure_text(text, font_family, font_size)
+    
+    tile = Image.new('RGBA', (bbox[2] - bbox[0], bbox[3] - bbox[1]), (*color, 0))
+    ImageDraw.Draw(tile).text((-bbox[0], -bbox[1]), text, font=font, fill=(*color, alpha))
+    
+    return tile
+
+
+def copy_for_drawing(img, copy=True):
+    """
+    返回用于绘制水印的图片副本
+    
+    RGB和RGBA只复制，带透明信息的其他模式转换为RGBA以保留透明度，其余转换为RGB。
+    
+    Args:
+        img (PIL.Image): 原图
+        copy (bool): RGB/RGBA图片是否复制；调用方不再使用原图时可传False直接在原图上绘制
+    """
+    if img.mode in ('RGB', 'RGBA'):
+        return img.copy() if copy else img
+    if img.mode in ('LA', 'PA') or 'transparency' in img.info:
+        return img.convert('RGBA')
+    return img.convert('RGB')
+
+
+def paste_layer(img, layer, xy):
+    """
+    将RGBA图层按alpha合成到图片上（原地修改）
+    
+    RGBA底图使用alpha_composite以正确合成透明度，超出底图的部分会被裁掉。
+    
+    Args:
+        img (PIL.Image): RGB或RGBA底图
+        layer (PIL.Image): RGBA图层
+        xy (tuple): 图层左上角在底图中的位置，可以为负
+    """
+    if img.mode != 'RGBA':
+        img.paste(layer, xy, layer)
+        return
+        
+    x, y = xy
+    left, top = max(x, 0), max(y, 0)
+    right, bottom = min(x + layer.width, img.width), min(y + layer.height, img.height)
+    if right > left and bottom > top:
+        img.alpha_composite(layer, (left, top), (left - x, top - y, right - x, bottom - y))
+
+
+def get_mtime(path):
+    """获取文件修改时间，路径为空或文件不可访问时返回None"""
+    if not path:
+        return None
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def load_preview_base(image_path, mtime, max_size):
+    """
+    加载缩放到预览尺寸的底图（带缓存）
+    
+    按 (图片路径, 修改时间, 预览尺寸) 缓存最近使用的几张底图，在图片之间来回切换时无需重新解码原图；
+    文件被修改后会重新加载。返回的图片为共享对象，调用方不应原地修改。
+    
+    Args:
+        image_path (str): 图片路径
+        mtime (float): 图片修改时间
+        max_size (tuple): 预览最大尺寸 (width, height)
+        
+    Returns:
+        tuple: (预览底图, 原图尺寸)
+    """
+    with Image.open(image_path) as img:
+        original_size = img.size
+        # JPEG可在解码阶段按1/2、1/4、1/8缩小，其他格式会忽略该设置
+        img.draft('RGB', (max_size[0] * 2, max_size[1] * 2))
+        base_img = img.copy()
+    base_img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    
+    return base_img, original_size
+
+
+def iter_image_files(root):
+    """
+    递归遍历目录下的图片文件
+    
+    使用os.scandir，文件类型来自目录读取结果，无需对每个条目单独stat；不进入符号链接目录，
+    跳过无法读取的子目录。
+    
+    Args:
+        root (str): 目录路径
+        
+    Yields:
+        str: 图片文件路径
+    """
+    try:
+        with os.scandir(root) as it:
+            entries = list(it)
+    except OSError as e:
+        # 与Path.rglob一致：无权限等无法读取的目录直接跳过
+        logger.warning(f"Skipping unreadable directory {root}: {e}")
+        return
+        
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_image_files(entry.path)
+        elif entry.is_file():
+            name = entry.name
+            dot = name.rfind('.')
+            if dot != -1 and name[dot:].lower() in SUPPORTED_EXTS:
+                yield entry.path
+
+
+def make_thumbnail(file_path, size):
+    """
+    生成图片列表使用的缩略图
+    
+    JPEG利用draft在解码阶段缩小，避免解码完整图片。
+    
+    Args:
+        file_path (str): 图片路径
+        size (tuple): 缩略图最大尺寸 (width, height)
+        
+    Returns:
+        PIL.Image: RGB或RGBA缩略图，无法读取时返回None
+    """
+    try:
+        with Image.open(file_path) as img:
+            img.draft('RGB', size)
+            img.thumbnail(size, Image.Resampling.BILINEAR)
+            return img if img.mode in ('RGB', 'RGBA') else img.convert('RGBA')
+    except Exception as e:
+        logger.error(f"Failed to create thumbnail for {file_path}: {e}")
+        return None
+
+
+# 影响水印渲染结果的配置项；输出格式、JPEG质量等只影响导出，不参与预览缓存键
+WATERMARK_CONFIG_KEYS = (
+    'text', 'font_size', 'font_family', 'color', 'opacity', 'position',
+    'offset_x', 'offset_y', 'rotation', 'image_path', 'image_scale', 'image_opacity'
+)
+
+
+def watermark_config_items(config):
+    """提取影响水印渲染的配置项，返回可哈希的键值对元组"""
+    return tuple((key, config[key]) for key in WATERMARK_CONFIG_KEYS)
+
+
+@functools.lru_cache(maxsize=32)
+def render_preview(image_path, mtime, max_size, config_items, watermark_mtime):
+    """
+    渲染带水印的预览图（带缓存）
+    
+    滑块回到之前的取值或切换回已预览的图片时直接返回缓存结果。
+    mtime和watermark_mtime只参与缓存键，图片或水印图片被修改后会重新渲染。
+    返回的图片为共享对象，调用方不应原地修改。
+    
+    Args:
+        image_path (str): 图片路径
+        mtime (float): 图片修改时间
+        max_size (tuple): 预览最大尺寸 (width, height)
+        config_items (tuple): watermark_config_items返回的水印配置键值对
+        watermark_mtime (float): 水印图片修改时间，没有水印图片时为None
+        
+    Returns:
+        tuple: (预览图, 原图尺寸)
+    """
+    # 获取缩小后的预览底图，水印按相同比例直接绘制在底图上
+    base_img, original_size = load_preview_base(image_path, mtime, max_size)
+    preview_scale = base_img.width / original_size[0]
+    return render_watermark(base_img, dict(config_items), preview_scale), original_size
+
+
+def load_thumbnail(file_path, size):
+    """
+    读取列表缩略图，优先使用磁盘缓存
+    
+    缓存文件名由图片路径、修改时间和缩略图尺寸生成，图片被修改后会重新生成。
+    
+    Args:
+        file_path (str): 图片路径
+        size (tuple): 缩略图最大尺寸 (width, height)
+        
+    Returns:
+        PIL.Image: RGB或RGBA缩略图，无法读取时返回None
+    """
+    try:
+        key = f"{os.path.abspath(file_path)}|{os.path.getmtime(file_path)}|{size[0]}x{size[1]}"
+        cache_path = THUMBNAIL_CACHE_DIR / (hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+    except OSError as e:
+        logger.error(f"Failed to create thumbnail for {file_path}: {e}")
+        return None
+        
+    try:
+        with Image.open(cache_path) as cached:
+            cached.load()
+    except Exception:
+        pass
+    else:
+        # 更新修改时间，清理缓存时按最近使用时间保留
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return cached
+        
+    thumbnail = make_thumbnail(file_path, size)
+    if thumbnail is not None:
+        # 缓存写入失败不影响显示
+        try:
+            THUMBNAIL_CACHE_DIR.mkdir(exist_ok=True)
+            # 先写唯一临时文件再替换，多个实例同时写入或写入中断时不会留下损坏的缓存文件
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format='PNG')
+            write_atomic(cache_path, buffer.getvalue())
+        except Exception as e:
+            logger.warning(f"Failed to cache thumbnail for {file_path}: {e}")
+            
+    return thumbnail
+
+
+def prune_thumbnail_cache(max_files=THUMBNAIL_CACHE_MAX_FILES):
+    """
+    清理缩略图磁盘缓存，只保留最近使用的max_files个文件
+    
+    Args:
+        max_files (int): 最多保留的缓存文件数
+    """
+    try:
+        with os.scandir(THUMBNAIL_CACHE_DIR) as it:
+            entries = [entry for entry in it if entry.name.endswith('.png') and entry.is_file()]
+    except OSError:
+        return
+        
+    if len(entries) <= max_files:
+        return
+        
+    def mtime(entry):
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return 0
+            
+    entries.sort(key=mtime)
+    removed = 0
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    logger.info(f"Removed {removed} old thumbnail cache files")
+
+
+def read_image_size(file_path):
+    """
+    读取图片尺寸
+    
+    优先使用imagesize只解析文件头；不可用或无法识别时回退到Image.open，同样不会解码像素数据。
+    
+    Returns:
+        tuple: (width, height)，无法读取时返回None
+    """
+    if IMAGESIZE_SUPPORT:
+        try:
+            width, height = imagesize.get(file_path)
+            if width > 0 and height > 0:
+                return width, height
+        except Exception:
+            pass
+            
+    try:
+        with Image.open(file_path) as img:
+            return img.size
+    except Exception as e:
+        logger.error(f"Failed to add image {file_path}: {e}")
+        return None
+
+
+# 各位置的坐标计算函数，参数为 (图片宽, 图片高, 水印宽, 水印高, 水平偏移, 垂直偏移)
+_POSITION_FUNCS = {
+    'top-left': lambda W, H, w, h, ox, oy: (ox, oy),
+    'top-center': lambda W, H, w, h, ox, oy: ((W - w) // 2, oy),
+    'top-right': lambda W, H, w, h, ox, oy: (W - w - ox, oy),
+    'middle-left': lambda W, H, w, h, ox, oy: (ox, (H - h) // 2),
+    'center': lambda W, H, w, h, ox, oy: ((W - w) // 2, (H - h) // 2),
+    'middle-right': lambda W, H, w, h, ox, oy: (W - w - ox, (H - h) // 2),
+    'bottom-left': lambda W, H, w, h, ox, oy: (ox, H - h - oy),
+    'bottom-center': lambda W, H, w, h, ox, oy: ((W - w) // 2, H - h - oy),
+    'bottom-right': lambda W, H, w, h, ox, oy: (W - w - ox, H - h - oy)
+}
+
+
+def calculate_position(img_size, item_size, position, offset_x, offset_y):
+    """计算水印位置"""
+    position_func = _POSITION_FUNCS.get(position, _POSITION_FUNCS['bottom-right'])
+    return position_func(*img_size, *item_size, offset_x, offset_y)
+
+
+def render_text_watermark(img, config, scale=1.0, copy=True):
+    """
+    添加文本水印
+    
+    Args:
+        img (PIL.Image): 底图
+        config (dict): 水印配置快照
+        scale (float): 底图相对原图的缩放比例
+        copy (bool): 是否在副本上绘制；为False时img必须为RGB/RGBA，直接在其上绘制
+        
+    Returns:
+        PIL.Image: RGB或RGBA模式的结果图片
+    """
+    try:
+        # 获取配置
+        text = config['text']
+        font_size = config['font_size']
+        font_family = config['font_family']
+        color_hex = config['color']
+        opacity = config['opacity']
+        position = config['position']
+        offset_x = config['offset_x']
+        offset_y = config['offset_y']
+        rotation = config['rotation']
+        
+        # 按预览比例缩放
+        if scale != 1.0:
+            font_size = max(1, round(font_size * scale))
+            offset_x = int(offset_x * scale)
+            offset_y = int(offset_y * scale)
+        
+        # 转换颜色
+        color = parse_hex_color(color_hex)
+        alpha = int(255 * opacity / 100)
+        
+        # 加载字体
+        font = load_font(font_family, font_size)
+            
+        # 获取文本尺寸
+        bbox = measure_text(text, font_family, font_size)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        # 计算位置
+        x, y = calculate_position(img.size, (text_width, text_height), position, offset_x, offset_y)
+        
+        # 默认在副本上绘制，不修改传入的图片
+        if copy:
+            img = copy_for_drawing(img)
+        
+        if rotation == 0 and alpha == 255:
+            # 不透明且无旋转时直接在底图上绘制
+            ImageDraw.Draw(img).text((x, y), text, font=font, fill=color)
+        elif text_width > 0 and text_height > 0:
+            # 只在文本大小的透明图块上绘制，避免分配整图大小的图层；旋转时绕文本中心旋转
+            tile = build_text_sprite(text, font_family, font_size, color, alpha, rotation)
+            # 图块只包含文字的实际像素，按边界框偏移放置，与直接以(x, y)为原点绘制时位置一致
+            x += bbox[0] - (tile.width - text_width) // 2
+            y += bbox[1] - (tile.height - text_height) // 2
+            
+            paste_layer(img, tile, (x, y))
+            
+    except Exception as e:
+        logger.error(f"Failed to add text watermark: {e}")
+        
+    return img
+
+
+def render_image_watermark(img, config, scale=1.0, copy=True):
+    """
+    添加图片水印
+    
+    Args:
+        img (PIL.Image): 底图
+        config (dict): 水印配置快照
+        scale (float): 底图相对原图的缩放比例
+        copy (bool): 是否在副本上绘制；为False时img必须为RGB/RGBA，直接在其上合成
+        
+    Returns:
+        PIL.Image: RGB或RGBA模式的结果图片
+    """
+    try:
+        watermark_path = config['image_path']
+        if not watermark_path or not os.path.exists(watermark_path):
+            return img
+            
+        # 加载水印图片
+        mtime = os.path.getmtime(watermark_path)
+        watermark = load_watermark_image(watermark_path, mtime)
+        
+        # 获取配置
+        image_scale = config['image_scale'] * scale
+        opacity = config['image_opacity']
+        position = config['position']
+        offset_x = int(config['offset_x'] * scale)
+        offset_y = int(config['offset_y'] * scale)
+        
+        # 调整水印尺寸
+        new_size = (max(1, int(watermark.width * image_scale)), max(1, int(watermark.height * image_scale)))
+        resample = Image.Resampling.LANCZOS if scale == 1.0 else PREVIEW_RESAMPLE
+        watermark = build_watermark_layer(watermark_path, mtime, new_size, opacity, resample)
+        
+        # 计算位置
+        x, y = calculate_position(img.size, watermark.size, position, offset_x, offset_y)
+        
+        # 合并图片：按水印alpha直接合成，无需整图转换模式再转回
+        if copy:
+            img = copy_for_drawing(img)
+        paste_layer(img, watermark, (x, y))
+            
+    except Exception as e:
+        logger.error(f"Failed to add image watermark: {e}")
+        
+    return img
+
+
+def render_watermark(img, config, scale=1.0, copy=True):
+    """
+    按配置为图片添加文本和图片水印
+    
+    Args:
+        img (PIL.Image): 底图
+        config (dict): 水印配置快照
+        scale (float): 底图相对原图的缩放比例，字号、偏移和水印图片尺寸按此比例缩放
+        copy (bool): 是否保留传入的图片不变；调用方不再使用原图时可传False省去整图复制
+        
+    Returns:
+        PIL.Image: 带水印的图片，没有需要添加的水印时为传入的图片本身
+    """
+    # 完全透明、字号或缩放为0、水印图片不存在时视为没有该水印，不做任何复制和合成
+    has_text = bool(config['text'].strip()) and config['opacity'] > 0 and config['font_size'] > 0
+    image_path = config['image_path'].strip()
+    has_image = (bool(image_path) and config['image_opacity'] > 0 and config['image_scale'] > 0
+                 and os.path.exists(image_path))
+    
+    # 没有可见水印时直接返回原图
+    if not (has_text or has_image):
+        return img
+        
+    # 文本和图片水印共用同一份可绘制的图片，整图最多复制或转换一次
+    result = copy_for_drawing(img, copy)
+    
+    # 添加文本水印
+    if has_text:
+        result = render_text_watermark(result, config, scale, copy=False)
+        
+    # 添加图片水印
+    if has_image:
+        result = render_image_watermark(result, config, scale, copy=False)
+        
+    return result
+
+
+def save_jpeg(img, output_path, config):
+    """按配置保存为JPEG，带透明通道时合成到白色背景上"""
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    # 优化哈夫曼表和渐进式编码可减小文件，但编码明显更慢，只在选择高压缩率时启用
+    high_compression = config.get('high_compression', False)
+    img.save(output_path, format='JPEG', quality=config['jpeg_quality'],
+             optimize=high_compression, progressive=high_compression)
+
+
+def save_png(img, output_path, config):
+    """按配置保存为PNG，保留原有模式和透明度"""
+    if img.mode == 'CMYK':
+        img = img.convert('RGB')
+    # 默认使用最快的zlib压缩级别；选择高压缩率时改用optimize（最高压缩级别，编码更慢）
+    if config.get('high_compression', False):
+        img.save(output_path, format='PNG', optimize=True)
+    else:
+        img.save(output_path, format='PNG', compress_level=1)
+
+
+# 输出格式 -> (保存函数, 文件扩展名)
+IMAGE_WRITERS = {
+    'JPEG': (save_jpeg, '.jpg'),
+    'PNG': (save_png, '.png')
+}
+
+
+def get_image_writer(output_format):
+    """
+    获取输出格式对应的保存函数和扩展名
+    
+    格式名不区分大小写（命令行创建的模板可能保存为小写），无法识别的格式按PNG保存。
+    
+    Returns:
+        tuple: (保存函数, 文件扩展名)
+    """
+    return IMAGE_WRITERS.get(str(output_format).upper(), IMAGE_WRITERS['PNG'])
+
+
+def export_image(input_path, output_path, config):
+    """
+    为单张图片添加水印并保存（可在子进程中执行）
+    
+    Args:
+        input_path (str): 输入图片路径
+        output_path (str): 输出图片路径
+        config (dict): 水印配置快照
+    """
+    save, _ = get_image_writer(config['output_format'])
+    with Image.open(input_path) as img:
+        # 添加水印并保存；打开的图片只在此处使用，可直接在其上绘制
+        save(render_watermark(img, config, copy=False), output_path, config)
+
 
 class ModernPhotoWatermarkGUI:
     """现代化的PhotoWatermark GUI应用"""
     
+    # 预览刷新防抖间隔（毫秒）
+    PREVIEW_DELAY_MS = 60
+    
+    # 轮询后台预览结果的间隔（毫秒）
+    RENDER_POLL_MS = 16
+    
+    # 导入目录时并行读取图片尺寸的线程数
+    PROBE_WORKERS = 8
+    
+    # 模板修改后延迟写入文件的时间（毫秒），连续修改只写一次
+    TEMPLATE_FLUSH_MS = 500
+    
+    # 图片列表缩略图尺寸
+    THUMBNAIL_SIZE = (32, 32)
+    
+    # 生成缩略图的线程数
+    THUMBNAIL_WORKERS = 2
+    
+    # 轮询缩略图结果的间隔（毫秒）
+    THUMBNAIL_POLL_MS = 50
+    
+    # 字体下拉框中的可选字体
+    FONT_FAMILIES = ('Arial', 'Times New Roman', 'Helvetica', 'Courier', 'Verdana')
+    
+    # 输出格式下拉框的选项，与IMAGE_WRITERS支持的格式保持一致
+    OUTPUT_FORMATS = tuple(IMAGE_WRITERS)
+    
+    # 轮询批量处理结果的间隔（毫秒），期间完成的图片合并为一次界面刷新
+    PROGRESS_POLL_MS = 100
+    
+    # 批量处理超过该数量时使用进程池，较少时使用线程池以免进程启动开销
+    PROCESS_POOL_MIN_IMAGES = 32
+    
     def __init__(self):
+        # 记录当前Pillow版本和JPEG解码库，便于确认是否使用了Pillow-SIMD和libjpeg-turbo
+        logger.info(f"Pillow version: {PIL.__version__}, "
+                    f"libjpeg-turbo: {features.check_feature('libjpeg_turbo')}")
+        
         # 初始化TkinterDnD
         self.root = TkinterDnD.Tk()
         self.root.title(f"PhotoWatermark v{__version__} - 现代化拖拽界面")
@@ -54,6 +744,8 @@ class ModernPhotoWatermarkGUI:
         
         # 初始化变量
         self.image_items = []
+        self._path_index = set()  # 已添加图片的规范化绝对路径，用于快速去重
+        self._tree_row_ids = []  # 与image_items一一对应的列表行ID
         self.current_image_index = 0
         self.output_directory = tk.StringVar(value=str(Path.home() / "Desktop" / "Watermarked"))
         
@@ -72,7 +764,8 @@ class ModernPhotoWatermarkGUI:
             'image_scale': tk.DoubleVar(value=1.0),
             'image_opacity': tk.IntVar(value=80),
             'output_format': tk.StringVar(value="JPEG"),
-            'jpeg_quality': tk.IntVar(value=95)
+            'jpeg_quality': tk.IntVar(value=95),
+            'high_compression': tk.BooleanVar(value=False)
         }
         
         # 拖拽相关变量
@@ -83,14 +776,50 @@ class ModernPhotoWatermarkGUI:
         self.preview_offset_x = 0
         self.preview_offset_y = 0
         self.watermark_items = []  # 存储画布上的水印元素
+        self._preview_items = None  # 预览画布上常驻的图元ID，首次显示预览时创建
+        
+        # 预览防抖：连续的设置变化只触发一次渲染
+        self._preview_after_id = None
+        
+        self.preview_photo = None
+        self.preview_geometry = None  # (预览图尺寸, 原图尺寸)
+        self._preview_origin = (0, 0)  # 预览图在画布上的左上角坐标
+        self.canvas_size = (1, 1)  # 预览画布尺寸，由<Configure>事件更新
+        
+        # 后台预览渲染：请求队列只保留最新一项
+        self._render_requests = queue.Queue(maxsize=1)
+        self._render_results = queue.Queue()
+        self._render_seq = 0
+        self._render_expected = None  # 等待显示的请求序号
+        self._last_preview_key = None  # 最近一次请求的 (图片路径, 修改时间, 画布尺寸, 水印配置)
+        self._render_polling = False
+        threading.Thread(target=self._preview_worker, daemon=True).start()
+        
+        # 图片列表缩略图：后台线程读取或生成，主线程创建PhotoImage
+        self._thumb_cache = {}  # 图片路径 -> PhotoImage，需保持引用
+        self._thumb_requests = queue.Queue()
+        self._thumb_results = queue.Queue()  # 每个请求对应一个结果，缩略图为None表示跳过或失败
+        self._thumb_pending = 0  # 尚未取回结果的请求数，只在主线程中修改
+        self._thumb_generation = 0  # 清空列表后丢弃旧请求的结果
+        for _ in range(self.THUMBNAIL_WORKERS):
+            threading.Thread(target=self._thumbnail_worker, daemon=True).start()
+        threading.Thread(target=prune_thumbnail_cache, daemon=True).start()
+        
+        # 批量处理结果：后台线程放入 (图片索引, 状态)，全部结束后放入None
+        self._process_results = queue.Queue()
+        self._process_jobs = []  # 当前批次的 (图片路径, 文件名) 列表
+        self._processed_count = 0
+        self._success_count = 0
         
         # 初始化组件
-        self.photo_watermark = PhotoWatermark()
-        self.template_manager = TemplateManager()
+        self.template_manager = TemplateManager(autosave=False)
+        self._template_names = None  # 模板列表当前显示的名称
+        self._template_flush_id = None
         
         # 创建界面
         self.create_widgets()
         self.bind_events()
+        self.load_last_settings()
         
         # 状态变量
         self.processing = False
@@ -180,9 +909,13 @@ class ModernPhotoWatermarkGUI:
         
         # 创建Treeview
         columns = ('name', 'size', 'status')
-        self.image_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=8)
+        thumb_width, thumb_height = self.THUMBNAIL_SIZE
+        ttk.Style().configure('Thumb.Treeview', rowheight=thumb_height + 4)
+        self.image_tree = ttk.Treeview(list_frame, columns=columns, show='tree headings', height=8,
+                                       style='Thumb.Treeview')
         
         # 设置列标题
+        self.image_tree.column('#0', width=thumb_width + 20, stretch=False)
         self.image_tree.heading('name', text='文件名')
         self.image_tree.heading('size', text='尺寸')
         self.image_tree.heading('status', text='状态')
@@ -282,7 +1015,7 @@ class ModernPhotoWatermarkGUI:
         
         ttk.Label(font_frame, text="字体:").grid(row=0, column=0, sticky=tk.W, pady=2)
         font_combo = ttk.Combobox(font_frame, textvariable=self.watermark_config['font_family'], 
-                                 values=['Arial', 'Times New Roman', 'Helvetica', 'Courier', 'Verdana'])
+                                 values=self.FONT_FAMILIES)
         font_combo.grid(row=0, column=1, sticky=tk.EW, padx=(5, 0), pady=2)
         font_combo.bind('<<ComboboxSelected>>', self.on_settings_change)
         
@@ -295,8 +1028,8 @@ class ModernPhotoWatermarkGUI:
         size_label.grid(row=1, column=2, padx=(5, 0), pady=2)
         
         def update_size_label(*args):
-            size_label.config(text=str(int(self.watermark_config['font_size'].get())))
-        self.watermark_config['font_size'].trace('w', update_size_label)
+            size_label.config(text=str(self.watermark_config['font_size'].get()))
+        self.watermark_config['font_size'].trace_add('write', update_size_label)
         
         font_frame.columnconfigure(1, weight=1)
         
@@ -327,8 +1060,8 @@ class ModernPhotoWatermarkGUI:
         opacity_label.pack(side=tk.RIGHT, padx=(5, 0))
         
         def update_opacity_label(*args):
-            opacity_label.config(text=f"{int(self.watermark_config['opacity'].get())}%")
-        self.watermark_config['opacity'].trace('w', update_opacity_label)
+            opacity_label.config(text=f"{self.watermark_config['opacity'].get()}%")
+        self.watermark_config['opacity'].trace_add('write', update_opacity_label)
         
         # 布局滚动框架
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -361,7 +1094,7 @@ class ModernPhotoWatermarkGUI:
         
         def update_scale_label(*args):
             scale_label.config(text=f"{self.watermark_config['image_scale'].get():.1f}x")
-        self.watermark_config['image_scale'].trace('w', update_scale_label)
+        self.watermark_config['image_scale'].trace_add('write', update_scale_label)
         
         # 透明度设置
         ttk.Label(parent, text="透明度:", style='Subtitle.TLabel').pack(anchor=tk.W, pady=(10, 2))
@@ -377,8 +1110,8 @@ class ModernPhotoWatermarkGUI:
         img_opacity_label.pack(side=tk.RIGHT, padx=(5, 0))
         
         def update_img_opacity_label(*args):
-            img_opacity_label.config(text=f"{int(self.watermark_config['image_opacity'].get())}%")
-        self.watermark_config['image_opacity'].trace('w', update_img_opacity_label)
+            img_opacity_label.config(text=f"{self.watermark_config['image_opacity'].get()}%")
+        self.watermark_config['image_opacity'].trace_add('write', update_img_opacity_label)
         
     def create_position_settings(self, parent):
         """创建位置设置"""
@@ -427,12 +1160,15 @@ class ModernPhotoWatermarkGUI:
         
         offset_frame.columnconfigure(1, weight=1)
         
-        def update_offset_labels(*args):
-            x_label.config(text=f"{int(self.watermark_config['offset_x'].get())}px")
-            y_label.config(text=f"{int(self.watermark_config['offset_y'].get())}px")
+        # X、Y各自只更新对应的标签
+        def update_offset_x_label(*args):
+            x_label.config(text=f"{self.watermark_config['offset_x'].get()}px")
         
-        self.watermark_config['offset_x'].trace('w', update_offset_labels)
-        self.watermark_config['offset_y'].trace('w', update_offset_labels)
+        def update_offset_y_label(*args):
+            y_label.config(text=f"{self.watermark_config['offset_y'].get()}px")
+        
+        self.watermark_config['offset_x'].trace_add('write', update_offset_x_label)
+        self.watermark_config['offset_y'].trace_add('write', update_offset_y_label)
         
         # 旋转设置
         ttk.Label(parent, text="旋转角度:", style='Subtitle.TLabel').pack(anchor=tk.W, pady=(10, 2))
@@ -447,8 +1183,8 @@ class ModernPhotoWatermarkGUI:
         rotation_label.pack(side=tk.RIGHT, padx=(5, 0))
         
         def update_rotation_label(*args):
-            rotation_label.config(text=f"{int(self.watermark_config['rotation'].get())}°")
-        self.watermark_config['rotation'].trace('w', update_rotation_label)
+            rotation_label.config(text=f"{self.watermark_config['rotation'].get()}°")
+        self.watermark_config['rotation'].trace_add('write', update_rotation_label)
         
     def create_template_settings(self, parent):
         """创建模板设置"""
@@ -490,7 +1226,7 @@ class ModernPhotoWatermarkGUI:
         
         ttk.Label(format_frame, text="输出格式:").pack(side=tk.LEFT)
         format_combo = ttk.Combobox(format_frame, textvariable=self.watermark_config['output_format'], 
-                                   values=["JPEG", "PNG"], state="readonly", width=10)
+                                   values=self.OUTPUT_FORMATS, state="readonly", width=10)
         format_combo.pack(side=tk.LEFT, padx=(10, 20))
         
         # JPEG质量设置
@@ -509,8 +1245,12 @@ class ModernPhotoWatermarkGUI:
         
         # 绑定事件
         format_combo.bind('<<ComboboxSelected>>', self._on_format_change)
-        self.quality_scale.bind('<Motion>', self._on_quality_change)
-        self.quality_scale.bind('<ButtonRelease-1>', self._on_quality_change)
+        # 只在数值变化时更新标签；<Motion>在鼠标悬停移动时也会持续触发
+        self.watermark_config['jpeg_quality'].trace_add('write', lambda *args: self._on_quality_change())
+        
+        # 压缩方式：默认快速编码，勾选后优化编码以减小文件（较慢）
+        ttk.Checkbutton(output_frame, text="高压缩率（较慢）",
+                        variable=self.watermark_config['high_compression']).pack(anchor=tk.W, pady=(5, 0))
         
         # 初始化质量控件状态
         self._on_format_change()
@@ -543,7 +1283,7 @@ class ModernPhotoWatermarkGUI:
         self.preview_canvas.bind("<Button-1>", self.on_preview_click)
         self.preview_canvas.bind("<B1-Motion>", self.on_preview_drag)
         self.preview_canvas.bind("<ButtonRelease-1>", self.on_preview_release)
-        self.preview_canvas.bind("<Motion>", self.on_preview_motion)
+        self.preview_canvas.bind("<Configure>", self.on_preview_resize)
         
     def on_drop(self, event):
         """处理拖拽事件"""
@@ -553,38 +1293,48 @@ class ModernPhotoWatermarkGUI:
     def add_files(self, files):
         """添加文件"""
         for file_path in files:
-            path = Path(file_path)
-            if path.is_file():
-                self.add_image_file(str(path))
-            elif path.is_dir():
-                self.add_images_from_directory(str(path))
+            # 每个路径只stat一次；非目录交给add_image_file，它会先按扩展名过滤
+            if os.path.isdir(file_path):
+                self.add_images_from_directory(file_path)
+            else:
+                self.add_image_file(file_path)
         
         self.update_image_list()
         self.update_drop_zone_text()
         
-    def add_image_file(self, file_path):
-        """添加单个图片文件"""
+    def add_image_file(self, file_path, size=None):
+        """
+        添加单个图片文件
+        
+        Args:
+            file_path (str): 图片路径
+            size (tuple): 已知的图片尺寸，为None时读取文件头获取
+        """
         try:
-            path = Path(file_path)
-            if path.suffix.lower() not in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
+            if os.path.splitext(file_path)[1].lower() not in SUPPORTED_EXTS:
                 return False
                 
             # 检查是否已存在
-            for item in self.image_items:
-                if item['path'] == str(path):
-                    return False
-                    
+            key = os.path.normcase(os.path.abspath(file_path))
+            if key in self._path_index:
+                return False
+                
+            path = Path(file_path)
+            
             # 获取图片信息
-            with Image.open(file_path) as img:
-                size = f"{img.width}x{img.height}"
+            if size is None:
+                size = read_image_size(file_path)
+                if size is None:
+                    return False
                 
             # 添加到列表
             self.image_items.append({
                 'path': str(path),
                 'name': path.name,
-                'size': size,
+                'size': f"{size[0]}x{size[1]}",
                 'status': '待处理'
             })
+            self._path_index.add(key)
             
             return True
             
@@ -594,13 +1344,17 @@ class ModernPhotoWatermarkGUI:
             
     def add_images_from_directory(self, dir_path):
         """从目录添加图片"""
-        supported_exts = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
         added_count = 0
         
-        for file_path in Path(dir_path).rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in supported_exts:
-                if self.add_image_file(str(file_path)):
-                    added_count += 1
+        candidates = list(iter_image_files(dir_path))
+        
+        # 读取尺寸只需解析文件头，主要耗时在I/O等待，使用线程池并行读取
+        with ThreadPoolExecutor(max_workers=self.PROBE_WORKERS) as executor:
+            sizes = list(executor.map(read_image_size, candidates))
+        
+        for file_path, size in zip(candidates, sizes):
+            if size is not None and self.add_image_file(file_path, size):
+                added_count += 1
                     
         return added_count
         
@@ -634,20 +1388,68 @@ class ModernPhotoWatermarkGUI:
         """清空图片列表"""
         if self.image_items and messagebox.askyesno("确认", "确定要清空所有图片吗？"):
             self.image_items.clear()
+            self._path_index.clear()
             self.update_image_list()
             self.update_drop_zone_text()
-            self.preview_canvas.delete("all")
+            self._render_expected = None  # 丢弃尚未显示的预览
+            self._last_preview_key = None
+            self.preview_geometry = None
+            # 释放已缓存的预览底图和预览图
+            load_preview_base.cache_clear()
+            render_preview.cache_clear()
+            self.preview_canvas.itemconfigure("preview", state='hidden')
             self.preview_info.config(text="请选择图片进行预览")
             
     def update_image_list(self):
         """更新图片列表显示"""
-        # 清空现有项目
-        for item in self.image_tree.get_children():
-            self.image_tree.delete(item)
+        # 图片只会追加或整体清空；列表变短时一次性删除全部行
+        if len(self._tree_row_ids) > len(self.image_items):
+            self.image_tree.delete(*self._tree_row_ids)
+            self._tree_row_ids.clear()
+            self._thumb_cache.clear()
+            self._thumb_generation += 1
+            
+        # 只插入新增的项目，已有行保持不变，缩略图交给后台线程生成
+        polling = self._thumb_pending > 0
+        for item in self.image_items[len(self._tree_row_ids):]:
+            row_id = self.image_tree.insert('', 'end', values=(item['name'], item['size'], item['status']))
+            self._tree_row_ids.append(row_id)
+            self._thumb_requests.put((self._thumb_generation, row_id, item['path']))
+            self._thumb_pending += 1
             
-        # 添加新项目
-        for i, item in enumerate(self.image_items):
-            self.image_tree.insert('', 'end', values=(item['name'], item['size'], item['status']))
+        # 有待取回的结果时轮询一直在进行，否则开始轮询
+        if self._thumb_pending and not polling:
+            self.root.after(self.THUMBNAIL_POLL_MS, self._poll_thumbnails)
+            
+    def _thumbnail_worker(self):
+        """缩略图线程：从队列中取出图片读取或生成缩略图，结果交给主线程轮询"""
+        while True:
+            generation, row_id, path = self._thumb_requests.get()
+            thumbnail = None
+            if generation == self._thumb_generation:
+                thumbnail = load_thumbnail(path, self.THUMBNAIL_SIZE)
+            self._thumb_results.put((generation, row_id, path, thumbnail))
+            
+    def _poll_thumbnails(self):
+        """在主线程中取回已生成的缩略图，还有未完成的请求时继续轮询"""
+        while True:
+            try:
+                result = self._thumb_results.get_nowait()
+            except queue.Empty:
+                break
+            self._thumb_pending -= 1
+            self._set_thumbnail(*result)
+            
+        if self._thumb_pending > 0:
+            self.root.after(self.THUMBNAIL_POLL_MS, self._poll_thumbnails)
+            
+    def _set_thumbnail(self, generation, row_id, path, thumbnail):
+        """在主线程中为列表行设置缩略图"""
+        if thumbnail is None or generation != self._thumb_generation:
+            return
+        photo = ImageTk.PhotoImage(thumbnail)
+        self._thumb_cache[path] = photo
+        self.image_tree.item(row_id, image=photo)
             
     def update_drop_zone_text(self):
         """更新拖拽区域文本"""
@@ -666,137 +1468,216 @@ class ModernPhotoWatermarkGUI:
             item_id = selection[0]
             index = self.image_tree.index(item_id)
             self.current_image_index = index
+            # 点击列表需要立即刷新，同时取消已安排的延迟刷新
+            self._cancel_scheduled_preview()
             self.update_preview()
             
     def update_preview(self):
-        """更新预览"""
+        """更新预览：在主线程收集参数，渲染交给后台预览线程"""
         if not self.image_items or self.current_image_index >= len(self.image_items):
             return
             
+        item = self.image_items[self.current_image_index]
+        
+        # 调整预览尺寸
+        canvas_width, canvas_height = self.canvas_size
+        
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
+            
+        # 图片及其修改时间、水印图片修改时间、画布尺寸和水印配置都与上次请求相同时无需重新渲染
+        config = self.get_config_snapshot()
+        config_items = watermark_config_items(config)
+        image_mtime = get_mtime(item['path'])
+        watermark_mtime = get_mtime(config['image_path'])
+        preview_key = (item['path'], image_mtime, watermark_mtime, (canvas_width, canvas_height), config_items)
+        if preview_key == self._last_preview_key:
+            return
+        self._last_preview_key = preview_key
+        
+        # 只保留最新的渲染请求，尚未开始的旧请求直接丢弃
+        self._render_seq += 1
+        self._render_expected = self._render_seq
+        request = (self._render_seq, item, (canvas_width, canvas_height), config, config_items,
+                   image_mtime, watermark_mtime)
         try:
-            item = self.image_items[self.current_image_index]
-            image_path = item['path']
+            self._render_requests.get_nowait()
+        except queue.Empty:
+            pass
+        self._render_requests.put(request)
+        
+        if not self._render_polling:
+            self._render_polling = True
+            self.root.after(self.RENDER_POLL_MS, self._poll_preview_result)
             
-            # 加载图片
-            with Image.open(image_path) as img:
-                # 创建预览图片
-                preview_img = self.create_watermark_preview(img)
+    def _preview_worker(self):
+        """预览渲染线程：解码、缩放并合成水印，结果交回主线程显示"""
+        while True:
+            seq, item, canvas_size, config, config_items, image_mtime, watermark_mtime = self._render_requests.get()
+            try:
+                if image_mtime is None:
+                    raise FileNotFoundError(f"Image not found: {item['path']}")
+                    
+                preview_img, original_size = render_preview(
+                    item['path'], image_mtime,
+                    (canvas_size[0] - 10, canvas_size[1] - 10),
+                    config_items, watermark_mtime)
+                self._render_results.put((seq, item, canvas_size, config, preview_img, original_size, None))
+            except Exception as e:
+                self._render_results.put((seq, item, canvas_size, config, None, None, e))
                 
-                # 调整预览尺寸
-                canvas_width = self.preview_canvas.winfo_width()
-                canvas_height = self.preview_canvas.winfo_height()
+    def _poll_preview_result(self):
+        """在主线程中取回渲染结果并显示"""
+        result = None
+        while True:
+            try:
+                result = self._render_results.get_nowait()
+            except queue.Empty:
+                break
                 
-                if canvas_width > 1 and canvas_height > 1:
-                    preview_img.thumbnail((canvas_width - 10, canvas_height - 10), Image.Resampling.LANCZOS)
-                    
-                    # 转换为PhotoImage
-                    self.preview_photo = ImageTk.PhotoImage(preview_img)
-                    
-                    # 清空画布并显示图片
-                    self.preview_canvas.delete("all")
-                    self.watermark_items.clear()  # 清空水印元素列表
-                    
-                    x = (canvas_width - preview_img.width) // 2
-                    y = (canvas_height - preview_img.height) // 2
-                    
-                    # 显示背景图片
-                    bg_item = self.preview_canvas.create_image(x, y, anchor=tk.NW, image=self.preview_photo)
-                    
-                    # 添加可拖拽的水印指示器
-                    self.add_watermark_indicators(img, preview_img, x, y)
-                    
-                    # 更新信息
-                    self.preview_info.config(text=f"预览: {item['name']} ({item['size']}) - 可拖拽水印位置")
+        if result is not None and result[0] == self._render_expected:
+            self._render_expected = None
+            self._show_preview(*result[1:])
+            
+        # 没有待显示的请求时停止轮询
+        if self._render_expected is None:
+            self._render_polling = False
+        else:
+            self.root.after(self.RENDER_POLL_MS, self._poll_preview_result)
+            
+    def _show_preview(self, item, canvas_size, config, preview_img, original_size, error):
+        """显示渲染完成的预览图片，水印指示器使用与渲染相同的配置快照"""
+        if error is not None:
+            logger.error(f"Failed to update preview: {error}")
+            self.preview_info.config(text="预览失败")
+            # 渲染失败时允许相同的请求再次渲染
+            self._last_preview_key = None
+            return
+            
+        try:
+            canvas_width, canvas_height = canvas_size
+            
+            # 转换为PhotoImage（必须在主线程中创建）；尺寸不变时复用已有图像，只更新像素
+            photo = self.preview_photo
+            if photo is not None and (photo.width(), photo.height()) == preview_img.size:
+                photo.paste(preview_img)
+            else:
+                self.preview_photo = ImageTk.PhotoImage(preview_img)
+            self.preview_geometry = (preview_img.size, original_size)
+            
+            # 复用画布上已有的图元，只更新位置和图像，避免每次删除并重建
+            items = self._get_preview_items()
+            
+            x = (canvas_width - preview_img.width) // 2
+            y = (canvas_height - preview_img.height) // 2
+            self._preview_origin = (x, y)
+            
+            # 显示背景图片
+            self.preview_canvas.coords(items['background'], x, y)
+            self.preview_canvas.itemconfigure(items['background'], image=self.preview_photo, state='normal')
+            
+            # 更新可拖拽的水印指示器
+            self.add_watermark_indicators(config, original_size, preview_img.size, x, y)
+            
+            # 更新信息
+            self.preview_info.config(text=f"预览: {item['name']} ({item['size']}) - 可拖拽水印位置")
                     
         except Exception as e:
             logger.error(f"Failed to update preview: {e}")
             self.preview_info.config(text="预览失败")
+            self._last_preview_key = None
+            
+    def _get_preview_items(self):
+        """获取预览画布上的常驻图元，不存在时创建（初始为隐藏状态，均带有preview标签）"""
+        if self._preview_items is None:
+            canvas = self.preview_canvas
+            items = {'background': canvas.create_image(0, 0, anchor=tk.NW, tags="preview", state='hidden')}
             
-    def add_watermark_indicators(self, original_img, preview_img, preview_x, preview_y):
-        """在预览中添加可拖拽的水印指示器"""
+            for kind, color, text in (('text', 'red', '文本'), ('image', 'blue', '图片')):
+                tag = f"watermark_{kind}"
+                # 半透明边框，不填充
+                items[f'{kind}_box'] = canvas.create_rectangle(
+                    0, 0, 0, 0,
+                    outline=color, width=2, stipple="gray25",
+                    fill="", tags=(tag, "preview"), state='hidden'
+                )
+                items[f'{kind}_label'] = canvas.create_text(
+                    0, 0,
+                    text=text, fill=color, font=("Arial", 8, "bold"),
+                    anchor="w", tags=(tag, "preview"), state='hidden'
+                )
+                
+                # 悬停光标由画布按标签分发的进出事件切换，无需在每次鼠标移动时查找最近图元
+                canvas.tag_bind(tag, '<Enter>', self.on_watermark_enter)
+                canvas.tag_bind(tag, '<Leave>', self.on_watermark_leave)
+                
+            self._preview_items = items
+            self.watermark_items = [items['text_box'], items['text_label'],
+                                    items['image_box'], items['image_label']]
+            
+        return self._preview_items
+        
+    def _place_indicator(self, kind, pos):
+        """移动水印指示器到指定位置，pos为None时隐藏"""
+        items = self._get_preview_items()
+        box, label = items[f'{kind}_box'], items[f'{kind}_label']
+        
+        if pos is None:
+            self.preview_canvas.itemconfigure(box, state='hidden')
+            self.preview_canvas.itemconfigure(label, state='hidden')
+            return
+            
+        x1, y1, x2, y2 = pos
+        
+        # 小标签在边框外
+        label_y = y1 - 12  # 在矩形上方
+        if label_y < 0:  # 如果上方空间不够，放在下方
+            label_y = y2 + 12
+            
+        self.preview_canvas.coords(box, x1, y1, x2, y2)
+        self.preview_canvas.coords(label, x1, label_y)
+        self.preview_canvas.itemconfigure(box, state='normal')
+        self.preview_canvas.itemconfigure(label, state='normal')
+        
+    def add_watermark_indicators(self, config, original_size, preview_size, preview_x, preview_y):
+        """在预览中显示可拖拽的水印指示器"""
         try:
             # 计算缩放比例
-            scale_x = preview_img.width / original_img.width
-            scale_y = preview_img.height / original_img.height
+            scale_x = preview_size[0] / original_size[0]
+            scale_y = preview_size[1] / original_size[1]
             
-            # 添加文本水印指示器
-            if self.watermark_config['text'].get().strip():
+            # 文本水印指示器
+            text_pos = None
+            if config['text'].strip():
                 text_pos = self.calculate_watermark_preview_position(
-                    original_img.size, 
-                    self.get_text_watermark_size(original_img),
+                    config, original_size, 
+                    self.get_text_watermark_size(config),
                     scale_x, scale_y, preview_x, preview_y
                 )
-                if text_pos:
-                    # 创建文本水印指示器（半透明边框，不填充）
-                    x1, y1, x2, y2 = text_pos
-                    text_indicator = self.preview_canvas.create_rectangle(
-                        x1, y1, x2, y2,
-                        outline="red", width=2, stipple="gray25",
-                        fill="", tags="watermark_text"
-                    )
-                    self.watermark_items.append(text_indicator)
-                    
-                    # 添加小标签在边框外
-                    label_x = x1
-                    label_y = y1 - 12  # 在矩形上方
-                    if label_y < 0:  # 如果上方空间不够，放在下方
-                        label_y = y2 + 12
-                    text_label = self.preview_canvas.create_text(
-                        label_x, label_y, 
-                        text="文本", fill="red", font=("Arial", 8, "bold"),
-                        anchor="w", tags="watermark_text"
-                    )
-                    self.watermark_items.append(text_label)
-            
-            # 添加图片水印指示器
-            if self.watermark_config['image_path'].get().strip():
+            self._place_indicator('text', text_pos)
+            
+            # 图片水印指示器
+            img_pos = None
+            if config['image_path'].strip():
                 img_pos = self.calculate_watermark_preview_position(
-                    original_img.size,
-                    self.get_image_watermark_size(original_img),
+                    config, original_size,
+                    self.get_image_watermark_size(config),
                     scale_x, scale_y, preview_x, preview_y
                 )
-                if img_pos:
-                    # 创建图片水印指示器（半透明边框，不填充）
-                    x1, y1, x2, y2 = img_pos
-                    img_indicator = self.preview_canvas.create_rectangle(
-                        x1, y1, x2, y2,
-                        outline="blue", width=2, stipple="gray25",
-                        fill="", tags="watermark_image"
-                    )
-                    self.watermark_items.append(img_indicator)
-                    
-                    # 添加小标签在边框外
-                    label_x = x1
-                    label_y = y1 - 12  # 在矩形上方
-                    if label_y < 0:  # 如果上方空间不够，放在下方
-                        label_y = y2 + 12
-                    img_label = self.preview_canvas.create_text(
-                        label_x, label_y,
-                        text="图片", fill="blue", font=("Arial", 8, "bold"),
-                        anchor="w", tags="watermark_image"
-                    )
-                    self.watermark_items.append(img_label)
+            self._place_indicator('image', img_pos)
                     
         except Exception as e:
             logger.error(f"Failed to add watermark indicators: {e}")
             
-    def get_text_watermark_size(self, img):
+    def get_text_watermark_size(self, config):
         """获取文本水印的尺寸"""
         try:
-            text = self.watermark_config['text'].get()
-            font_size = self.watermark_config['font_size'].get()
-            font_family = self.watermark_config['font_family'].get()
-            
-            # 创建临时绘图对象来计算文本尺寸
-            temp_img = Image.new('RGB', (100, 100))
-            draw = ImageDraw.Draw(temp_img)
+            text = config['text']
+            font_size = config['font_size']
+            font_family = config['font_family']
             
-            try:
-                font = ImageFont.truetype(font_family, font_size)
-            except:
-                font = ImageFont.load_default()
-                
-            bbox = draw.textbbox((0, 0), text, font=font)
+            # 直接由字体计算文本尺寸（带缓存），无需创建临时绘图对象
+            bbox = measure_text(text, font_family, font_size)
             width = bbox[2] - bbox[0]
             height = bbox[3] - bbox[1]
             
@@ -804,27 +1685,27 @@ class ModernPhotoWatermarkGUI:
         except:
             return (100, 30)  # 默认尺寸
             
-    def get_image_watermark_size(self, img):
+    def get_image_watermark_size(self, config):
         """获取图片水印的尺寸"""
         try:
-            watermark_path = self.watermark_config['image_path'].get()
-            scale = self.watermark_config['image_scale'].get()
+            watermark_path = config['image_path']
+            scale = config['image_scale']
             
             if watermark_path and os.path.exists(watermark_path):
-                with Image.open(watermark_path) as wm_img:
-                    width = int(wm_img.width * scale)
-                    height = int(wm_img.height * scale)
-                    return (width, height)
+                wm_img = load_watermark_image(watermark_path, os.path.getmtime(watermark_path))
+                width = int(wm_img.width * scale)
+                height = int(wm_img.height * scale)
+                return (width, height)
         except:
             pass
         return (50, 50)  # 默认尺寸
         
-    def calculate_watermark_preview_position(self, img_size, watermark_size, scale_x, scale_y, preview_x, preview_y):
+    def calculate_watermark_preview_position(self, config, img_size, watermark_size, scale_x, scale_y, preview_x, preview_y):
         """计算水印在预览中的位置"""
         try:
-            position = self.watermark_config['position'].get()
-            offset_x = self.watermark_config['offset_x'].get()
-            offset_y = self.watermark_config['offset_y'].get()
+            position = config['position']
+            offset_x = config['offset_x']
+            offset_y = config['offset_y']
             
             # 计算原图中的水印位置
             orig_x, orig_y = self.calculate_position(img_size, watermark_size, position, offset_x, offset_y)
@@ -844,143 +1725,13 @@ class ModernPhotoWatermarkGUI:
         except:
             return None
     
-    def create_watermark_preview(self, img):
-        """创建带水印的预览图片"""
-        # 复制图片
-        preview_img = img.copy()
-        
-        # 添加文本水印
-        if self.watermark_config['text'].get().strip():
-            preview_img = self.add_text_watermark(preview_img)
-            
-        # 添加图片水印
-        if self.watermark_config['image_path'].get().strip():
-            preview_img = self.add_image_watermark(preview_img)
-            
-        return preview_img
-        
-    def add_text_watermark(self, img):
-        """添加文本水印"""
-        try:
-            # 创建绘图对象
-            draw = ImageDraw.Draw(img)
-            
-            # 获取配置
-            text = self.watermark_config['text'].get()
-            font_size = self.watermark_config['font_size'].get()
-            font_family = self.watermark_config['font_family'].get()
-            color_hex = self.watermark_config['color'].get()
-            opacity = self.watermark_config['opacity'].get()
-            position = self.watermark_config['position'].get()
-            offset_x = self.watermark_config['offset_x'].get()
-            offset_y = self.watermark_config['offset_y'].get()
-            rotation = self.watermark_config['rotation'].get()
-            
-            # 转换颜色
-            color = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
-            color_with_alpha = (*color, int(255 * opacity / 100))
-            
-            # 加载字体
-            try:
-                font = ImageFont.truetype(font_family, font_size)
-            except:
-                font = ImageFont.load_default()
-                
-            # 获取文本尺寸
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # 计算位置
-            x, y = self.calculate_position(img.size, (text_width, text_height), position, offset_x, offset_y)
-            
-            # 如果需要旋转，创建透明图层
-            if rotation != 0:
-                # 创建透明图层
-                txt_layer = Image.new('RGBA', img.size, (255, 255, 255, 0))
-                txt_draw = ImageDraw.Draw(txt_layer)
-                txt_draw.text((x, y), text, font=font, fill=color_with_alpha)
-                
-                # 旋转图层
-                rotated = txt_layer.rotate(rotation, expand=False)
-                
-                # 合并到原图
-                img = Image.alpha_composite(img.convert('RGBA'), rotated).convert('RGB')
-            else:
-                # 直接绘制文本
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                draw = ImageDraw.Draw(img)
-                draw.text((x, y), text, font=font, fill=color_with_alpha)
-                img = img.convert('RGB')
-                
-        except Exception as e:
-            logger.error(f"Failed to add text watermark: {e}")
-            
-        return img
-        
-    def add_image_watermark(self, img):
-        """添加图片水印"""
-        try:
-            watermark_path = self.watermark_config['image_path'].get()
-            if not watermark_path or not os.path.exists(watermark_path):
-                return img
-                
-            # 加载水印图片
-            with Image.open(watermark_path) as watermark:
-                # 获取配置
-                scale = self.watermark_config['image_scale'].get()
-                opacity = self.watermark_config['image_opacity'].get()
-                position = self.watermark_config['position'].get()
-                offset_x = self.watermark_config['offset_x'].get()
-                offset_y = self.watermark_config['offset_y'].get()
-                
-                # 调整水印尺寸
-                new_size = (int(watermark.width * scale), int(watermark.height * scale))
-                watermark = watermark.resize(new_size, Image.Resampling.LANCZOS)
-                
-                # 调整透明度
-                if watermark.mode != 'RGBA':
-                    watermark = watermark.convert('RGBA')
-                    
-                # 应用透明度
-                alpha = watermark.split()[-1]
-                alpha = alpha.point(lambda p: int(p * opacity / 100))
-                watermark.putalpha(alpha)
-                
-                # 计算位置
-                x, y = self.calculate_position(img.size, watermark.size, position, offset_x, offset_y)
-                
-                # 合并图片
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                    
-                img.paste(watermark, (x, y), watermark)
-                img = img.convert('RGB')
-                
-        except Exception as e:
-            logger.error(f"Failed to add image watermark: {e}")
-            
-        return img
+    def get_config_snapshot(self):
+        """读取当前水印配置为普通字典，供渲染函数和子进程使用"""
+        return {key: var.get() for key, var in self.watermark_config.items()}
         
     def calculate_position(self, img_size, item_size, position, offset_x, offset_y):
         """计算水印位置"""
-        img_width, img_height = img_size
-        item_width, item_height = item_size
-        
-        positions = {
-            'top-left': (offset_x, offset_y),
-            'top-center': ((img_width - item_width) // 2, offset_y),
-            'top-right': (img_width - item_width - offset_x, offset_y),
-            'middle-left': (offset_x, (img_height - item_height) // 2),
-            'center': ((img_width - item_width) // 2, (img_height - item_height) // 2),
-            'middle-right': (img_width - item_width - offset_x, (img_height - item_height) // 2),
-            'bottom-left': (offset_x, img_height - item_height - offset_y),
-            'bottom-center': ((img_width - item_width) // 2, img_height - item_height - offset_y),
-            'bottom-right': (img_width - item_width - offset_x, img_height - item_height - offset_y)
-        }
-        
-        return positions.get(position, positions['bottom-right'])
+        return calculate_position(img_size, item_size, position, offset_x, offset_y)
      
     def select_color(self):
         """选择颜色"""
@@ -1017,8 +1768,29 @@ class ModernPhotoWatermarkGUI:
         """设置改变事件"""
         # 更新预览
         if hasattr(self, 'preview_canvas'):
-            self.root.after_idle(self.update_preview)
+            self._schedule_preview()
+            
+    def _schedule_preview(self):
+        """安排一次预览刷新，取消尚未执行的刷新以合并连续事件"""
+        self._cancel_scheduled_preview()
+        self._preview_after_id = self.root.after(self.PREVIEW_DELAY_MS, self._run_scheduled_preview)
+        
+    def _cancel_scheduled_preview(self):
+        """取消尚未执行的预览刷新"""
+        if self._preview_after_id is not None:
+            self.root.after_cancel(self._preview_after_id)
+            self._preview_after_id = None
+        
+    def _run_scheduled_preview(self):
+        """执行已安排的预览刷新"""
+        self._preview_after_id = None
+        self.update_preview()
             
+    def on_preview_resize(self, event):
+        """预览画布尺寸改变事件"""
+        self.canvas_size = (event.width, event.height)
+        self._schedule_preview()
+        
     def on_mousewheel(self, event):
         """鼠标滚轮事件"""
         # 可以用于缩放预览图片
@@ -1029,11 +1801,9 @@ class ModernPhotoWatermarkGUI:
         if not self.image_items or self.current_image_index >= len(self.image_items):
             return
             
-        # 检查是否点击在水印区域
-        clicked_item = self.preview_canvas.find_closest(event.x, event.y)[0]
-        
-        # 检查是否是水印元素
-        if clicked_item in self.watermark_items:
+        # 检查鼠标下方的图元（current标签由画布维护）是否是水印元素
+        current = self.preview_canvas.find_withtag('current')
+        if current and current[0] in self.watermark_items:
             self.dragging = True
             self.drag_start_x = event.x
             self.drag_start_y = event.y
@@ -1055,71 +1825,65 @@ class ModernPhotoWatermarkGUI:
         self.drag_start_x = event.x
         self.drag_start_y = event.y
         
-        # 实时更新预览
-        self.update_preview()
+        # 拖拽过程中只移动指示器，松开鼠标后再重新渲染预览
+        self._move_indicators()
         
     def on_preview_release(self, event):
         """预览画布鼠标释放事件"""
         if self.dragging:
             self.dragging = False
             self.preview_canvas.config(cursor="")
+            self._cancel_scheduled_preview()
+            self.update_preview()
+            
+    def _move_indicators(self):
+        """按当前偏移量移动画布上的水印指示器，不重新渲染预览图"""
+        if self.preview_geometry is None:
+            return
+            
+        preview_size, original_size = self.preview_geometry
+        preview_x, preview_y = self._preview_origin
+        self.add_watermark_indicators(self.get_config_snapshot(), original_size, preview_size, preview_x, preview_y)
             
-    def on_preview_motion(self, event):
-        """预览画布鼠标移动事件"""
+    def on_watermark_enter(self, event):
+        """鼠标进入水印指示器"""
         if not self.dragging:
-            # 检查鼠标是否悬停在水印上
-            try:
-                closest_items = self.preview_canvas.find_closest(event.x, event.y)
-                if closest_items:
-                    closest_item = closest_items[0]
-                    if closest_item in self.watermark_items:
-                        self.preview_canvas.config(cursor="hand2")
-                    else:
-                        self.preview_canvas.config(cursor="")
-                else:
-                    self.preview_canvas.config(cursor="")
-            except (IndexError, tk.TclError):
-                # 如果画布上没有元素或发生其他错误，设置默认光标
-                self.preview_canvas.config(cursor="")
+            self.preview_canvas.config(cursor="hand2")
+            
+    def on_watermark_leave(self, event):
+        """鼠标离开水印指示器"""
+        if not self.dragging:
+            self.preview_canvas.config(cursor="")
                 
     def update_watermark_position_from_drag(self, dx, dy):
         """根据拖拽距离更新水印位置"""
         if not self.image_items or self.current_image_index >= len(self.image_items):
             return
             
-        # 获取画布和图片尺寸
-        canvas_width = self.preview_canvas.winfo_width()
-        canvas_height = self.preview_canvas.winfo_height()
-        
-        if canvas_width <= 1 or canvas_height <= 1:
+        # 使用最近一次显示的预览尺寸换算到原图坐标
+        if self.preview_geometry is None:
             return
             
-        # 计算相对于原图的偏移量
-        # 这里需要考虑预览图片的缩放比例
         try:
-            item = self.image_items[self.current_image_index]
-            with Image.open(item['path']) as img:
-                # 计算预览图片的实际尺寸和位置
-                preview_img = img.copy()
-                preview_img.thumbnail((canvas_width - 10, canvas_height - 10), Image.Resampling.LANCZOS)
-                
-                # 计算缩放比例
-                scale_x = img.width / preview_img.width
-                scale_y = img.height / preview_img.height
-                
-                # 转换拖拽距离到原图坐标（强制取反方向修正）
-                real_dx = -dx * scale_x
-                real_dy = -dy * scale_y
-                
-                # 更新偏移量（直接加上增量）
-                current_x = self.watermark_config['offset_x'].get()
-                current_y = self.watermark_config['offset_y'].get()
-                
-                new_x = max(0, min(img.width, current_x + real_dx))
-                new_y = max(0, min(img.height, current_y + real_dy))
-                
-                self.watermark_config['offset_x'].set(int(new_x))
-                self.watermark_config['offset_y'].set(int(new_y))
+            (preview_width, preview_height), (img_width, img_height) = self.preview_geometry
+            
+            # 计算缩放比例
+            scale_x = img_width / preview_width
+            scale_y = img_height / preview_height
+            
+            # 转换拖拽距离到原图坐标（强制取反方向修正）
+            real_dx = -dx * scale_x
+            real_dy = -dy * scale_y
+            
+            # 更新偏移量（直接加上增量）
+            current_x = self.watermark_config['offset_x'].get()
+            current_y = self.watermark_config['offset_y'].get()
+            
+            new_x = max(0, min(img_width, current_x + real_dx))
+            new_y = max(0, min(img_height, current_y + real_dy))
+            
+            self.watermark_config['offset_x'].set(int(new_x))
+            self.watermark_config['offset_y'].set(int(new_y))
                 
         except Exception as e:
             logger.error(f"Failed to update watermark position: {e}")
@@ -1142,16 +1906,13 @@ class ModernPhotoWatermarkGUI:
                 # 修复字段名映射问题
                 if 'color' in config:
                     # 将颜色从十六进制转换为RGB元组
-                    color_hex = config['color']
-                    if color_hex.startswith('#'):
-                        color_hex = color_hex[1:]
-                    rgb = tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
-                    config['font_color'] = rgb
+                    config['font_color'] = parse_hex_color(config['color'])
                     del config['color']  # 删除原字段
                     
                 # 保存模板 - 修正参数顺序
                 success = self.template_manager.save_template(name, config, "用户自定义模板", overwrite=True)
                 if success:
+                    self._schedule_template_flush()
                     self.update_template_list()
                     messagebox.showinfo("成功", f"模板 '{name}' 保存成功！")
                 else:
@@ -1172,7 +1933,7 @@ class ModernPhotoWatermarkGUI:
         
         try:
             # load_template返回config字典，不是template对象
-            config = self.template_manager.load_template(template_name)
+            config = self.template_manager.load_template(template_name, copy=False)
             if config:
                 # 应用模板设置
                 for key, value in config.items():
@@ -1199,7 +1960,8 @@ class ModernPhotoWatermarkGUI:
                             self.watermark_config['color'].set(hex_color)
                             self.color_preview.config(bg=hex_color)
                 
-                # 更新颜色预览
+                # 所有设置写入后只刷新一次预览，并取消已安排的延迟刷新
+                self._cancel_scheduled_preview()
                 self.update_preview()
                 messagebox.showinfo("成功", f"模板 '{template_name}' 加载成功！")
             else:
@@ -1220,21 +1982,37 @@ class ModernPhotoWatermarkGUI:
         
         if messagebox.askyesno("确认", f"确定要删除模板 '{template_name}' 吗？"):
             try:
-                self.template_manager.delete_template(template_name)
+                if self.template_manager.delete_template(template_name):
+                    self._schedule_template_flush()
                 self.update_template_list()
                 messagebox.showinfo("成功", f"模板 '{template_name}' 删除成功！")
                 
             except Exception as e:
                 messagebox.showerror("错误", f"删除模板失败: {e}")
                 
-    def update_template_list(self):
-        """更新模板列表"""
-        self.template_listbox.delete(0, tk.END)
+    def _schedule_template_flush(self):
+        """安排将模板修改写入文件，连续修改合并为一次写入"""
+        if self._template_flush_id is not None:
+            self.root.after_cancel(self._template_flush_id)
+        self._template_flush_id = self.root.after(self.TEMPLATE_FLUSH_MS, self._flush_templates)
+        
+    def _flush_templates(self):
+        """在后台线程中写入模板文件，不阻塞界面"""
+        self._template_flush_id = None
+        self.template_manager.flush(background=True)
         
+    def update_template_list(self):
+        """更新模板列表，名称没有变化时不重建列表"""
         try:
-            templates = self.template_manager.list_templates()
-            for template_info in templates:
-                self.template_listbox.insert(tk.END, template_info['name'])
+            # 列表只显示名称，无需生成每个模板的配置摘要
+            names = tuple(self.template_manager.list_template_names())
+            if names == self._template_names:
+                return
+                
+            self.template_listbox.delete(0, tk.END)
+            if names:
+                self.template_listbox.insert(tk.END, *names)
+            self._template_names = names
                 
         except Exception as e:
             logger.error(f"Failed to update template list: {e}")
@@ -1260,71 +2038,110 @@ class ModernPhotoWatermarkGUI:
         # 开始处理
         self.processing = True
         self.process_btn.config(text="处理中...", state='disabled')
-        self.progress.config(maximum=len(self.image_items), value=0)
+        # 在主线程读取图片列表和配置，处理期间列表被清空或追加不影响本批任务
+        jobs = [(item['path'], item['name']) for item in self.image_items]
+        config = self.get_config_snapshot()
+        total_count = len(jobs)
+        
+        self.progress.config(maximum=total_count, value=0)
+        self.status_label.config(text=f"处理中 0/{total_count}")
+        self._mark_all_items("处理中")
+        self._process_jobs = jobs
+        self._processed_count = 0
+        self._success_count = 0
         
         # 在新线程中处理
-        thread = threading.Thread(target=self._process_images_thread)
+        thread = threading.Thread(target=self._process_images_thread, args=(jobs, config, output_dir))
         thread.daemon = True
         thread.start()
+        self.root.after(self.PROGRESS_POLL_MS, self._poll_process_results, total_count)
         
-    def _process_images_thread(self):
-        """处理图片线程"""
-        success_count = 0
-        total_count = len(self.image_items)
+    def _process_images_thread(self, jobs, config, output_dir):
+        """
+        处理图片线程，将各图片分发到线程池或进程池并行处理，结果交给主线程轮询
         
-        for i, item in enumerate(self.image_items):
-            try:
-                # 更新状态
-                self.root.after(0, lambda idx=i: self._update_item_status(idx, "处理中"))
-                self.root.after(0, lambda val=i: self.progress.config(value=val))
-                self.root.after(0, lambda: self.status_label.config(text=f"处理中 {i+1}/{total_count}"))
-                
-                # 处理图片
-                input_path = item['path']
-                output_format = self.watermark_config['output_format'].get()
-                file_extension = '.jpg' if output_format == 'JPEG' else '.png'
-                output_path = Path(self.output_directory.get()) / f"watermarked_{Path(item['name']).stem}{file_extension}"
-                
-                # 加载图片
-                with Image.open(input_path) as img:
-                    # 添加水印
-                    watermarked_img = self.create_watermark_preview(img)
-                    
-                    # 保存图片
-                    if output_format == 'JPEG':
-                        # 如果原图有透明通道，转换为RGB
-                        if watermarked_img.mode in ('RGBA', 'LA'):
-                            background = Image.new('RGB', watermarked_img.size, (255, 255, 255))
-                            background.paste(watermarked_img, mask=watermarked_img.split()[-1] if watermarked_img.mode == 'RGBA' else None)
-                            watermarked_img = background
-                        
-                        quality = self.watermark_config['jpeg_quality'].get()
-                        watermarked_img.save(str(output_path), format='JPEG', quality=quality, optimize=True)
-                    else:  # PNG
-                        watermarked_img.save(str(output_path), format='PNG', optimize=True)
+        Args:
+            jobs (list): 主线程生成的 (图片路径, 文件名) 列表，不访问self.image_items
+            config (dict): 水印配置快照
+            output_dir (Path): 输出目录
+        """
+        total_count = len(jobs)
+        
+        try:
+            _, file_extension = get_image_writer(config['output_format'])
+            
+            # Pillow解码、编码和缩放时会释放GIL，少量图片用线程即可并行；大批量时进程池更能利用多核
+            max_workers = min(os.cpu_count() or 1, total_count)
+            if total_count > self.PROCESS_POOL_MIN_IMAGES:
+                # 使用spawn启动子进程：fork会复制已运行Tk和预览、缩略图线程的GUI进程
+                executor = ProcessPoolExecutor(max_workers=max_workers,
+                                               mp_context=multiprocessing.get_context('spawn'))
+            else:
+                executor = ThreadPoolExecutor(max_workers=max_workers)
+            with executor:
+                futures = {}
+                for i, (path, name) in enumerate(jobs):
+                    output_path = output_dir / f"watermarked_{Path(name).stem}{file_extension}"
+                    future = executor.submit(export_image, path, str(output_path), config)
+                    futures[future] = i
                     
-                success_count += 1
-                self.root.after(0, lambda idx=i: self._update_item_status(idx, "完成"))
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        future.result()
+                        status = "完成"
+                    except Exception as e:
+                        logger.error(f"Failed to process {jobs[i][0]}: {e}")
+                        status = "失败"
+                    self._process_results.put((i, status))
+        except Exception as e:
+            logger.error(f"Batch processing failed: {e}")
+        finally:
+            # 处理完成（包括异常退出），通知主线程结束轮询
+            self._process_results.put(None)
+            
+    def _poll_process_results(self, total_count):
+        """在主线程中取回已完成的处理结果，每次轮询只刷新一次进度"""
+        finished = False
+        while True:
+            try:
+                result = self._process_results.get_nowait()
+            except queue.Empty:
+                break
+            if result is None:
+                finished = True
+                break
                 
-            except Exception as e:
-                logger.error(f"Failed to process {item['path']}: {e}")
-                self.root.after(0, lambda idx=i: self._update_item_status(idx, "失败"))
+            index, status = result
+            # 处理期间列表可能被清空或重新添加，只更新仍对应同一图片的行
+            if (index < len(self.image_items)
+                    and self.image_items[index]['path'] == self._process_jobs[index][0]):
+                self._update_item_status(index, status)
+            self._processed_count += 1
+            if status == "完成":
+                self._success_count += 1
                 
-        # 处理完成
-        self.root.after(0, lambda: self._process_complete(success_count, total_count))
+        if finished:
+            self._process_complete(self._success_count, total_count)
+            return
+            
+        self.progress.config(value=self._processed_count)
+        self.status_label.config(text=f"处理中 {self._processed_count}/{total_count}")
+        self.root.after(self.PROGRESS_POLL_MS, self._poll_process_results, total_count)
+        
+    def _mark_all_items(self, status):
+        """将所有项目设置为同一状态"""
+        for index in range(len(self.image_items)):
+            self._update_item_status(index, status)
         
     def _update_item_status(self, index, status):
         """更新项目状态"""
         if index < len(self.image_items):
             self.image_items[index]['status'] = status
             
-            # 更新树视图
-            children = self.image_tree.get_children()
-            if index < len(children):
-                item_id = children[index]
-                values = list(self.image_tree.item(item_id, 'values'))
-                values[2] = status  # 状态列
-                self.image_tree.item(item_id, values=values)
+            # 更新树视图，直接按行ID修改状态列
+            if index < len(self._tree_row_ids):
+                self.image_tree.set(self._tree_row_ids[index], 'status', status)
                 
     def _process_complete(self, success_count, total_count):
         """处理完成"""
@@ -1341,17 +2158,9 @@ class ModernPhotoWatermarkGUI:
         else:
             messagebox.showerror("处理失败", "没有成功处理任何图片")
             
-        if success_count > 0:
-            message = f"成功处理 {success_count} 张图片"
-            if success_count < total_count:
-                message += f"，{total_count - success_count} 张失败"
-            messagebox.showinfo("处理完成", message)
-        else:
-            messagebox.showerror("处理失败", "没有成功处理任何图片")
-            
     def _on_format_change(self, event=None):
         """输出格式改变事件"""
-        format_type = self.watermark_config['output_format'].get()
+        format_type = self.watermark_config['output_format'].get().upper()
         if format_type == "JPEG":
             self.quality_label.config(state="normal")
             self.quality_scale.config(state="normal")
@@ -1363,15 +2172,68 @@ class ModernPhotoWatermarkGUI:
     
     def _on_quality_change(self, event=None):
         """JPEG质量改变事件"""
-        quality = int(self.watermark_config['jpeg_quality'].get())
+        quality = self.watermark_config['jpeg_quality'].get()
         self.quality_value_label.config(text=str(quality))
     
+    def load_last_settings(self):
+        """恢复上次关闭时保存的水印配置和输出目录"""
+        try:
+            with open(LAST_SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Failed to load last settings: {e}")
+            return
+            
+        for key, value in settings.get('watermark_config', {}).items():
+            var = self.watermark_config.get(key)
+            if var is None:
+                continue
+            previous = var.get()
+            var.set(value)
+            try:
+                var.get()
+            except (tk.TclError, ValueError):
+                # 类型不匹配时保留默认值
+                var.set(previous)
+                
+        output_directory = settings.get('output_directory')
+        if output_directory:
+            self.output_directory.set(output_directory)
+            
+        try:
+            self.color_preview.config(bg=self.watermark_config['color'].get())
+        except tk.TclError:
+            self.watermark_config['color'].set(self.color_preview.cget('bg'))
+        self._on_format_change()
+        
+    def save_last_settings(self):
+        """保存当前水印配置和输出目录，供下次启动时恢复"""
+        settings = {
+            'watermark_config': self.get_config_snapshot(),
+            'output_directory': self.output_directory.get()
+        }
+        try:
+            # 先写临时文件再替换，退出时被中断也不会留下损坏的设置文件
+            data = json.dumps(settings, ensure_ascii=False, indent=2).encode('utf-8')
+            write_atomic(LAST_SETTINGS_FILE, data)
+        except Exception as e:
+            logger.warning(f"Failed to save last settings: {e}")
+            
     def on_closing(self):
         """关闭事件"""
         if self.processing:
             if not messagebox.askyesno("确认", "正在处理图片，确定要退出吗？"):
                 return
                 
+        # 退出前同步写入尚未保存的模板
+        if self._template_flush_id is not None:
+            self.root.after_cancel(self._template_flush_id)
+            self._template_flush_id = None
+        self.template_manager.flush()
+        self.save_last_settings()
+        
         self.root.destroy()
         
     def run(self):
@@ -1390,4 +2252,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # PyInstaller打包后进程池的子进程会重新运行本程序，需由freeze_support接管
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file